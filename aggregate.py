@@ -0,0 +1,322 @@
+# Season leaderboards over every stored scorecard, computed on columnar arrays
+# Batting and bowling rows of all matches are flattened into one integer column per field, with
+# player and team names interned to codes. A leaderboard is then a grouped sum (bincount) and a
+# sort instead of a loop over row dicts. NumPy is used when installed, otherwise the same columns
+# live in array.array and the grouped sums are a single zip over them.
+import heapq
+import threading
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BATTING_COLUMNS = ('match', 'player', 'team', 'innings', 'runs', 'balls', 'fours', 'sixes', 'outs')
+BOWLING_COLUMNS = ('match', 'player', 'team', 'innings', 'balls', 'maidens', 'runs', 'wickets')
+
+# Qualifiers for the rate leaderboards (balls faced / bowled)
+MIN_BATTING_BALLS = 60
+MIN_BOWLING_BALLS = 120
+
+BOARDS = ('runs', 'strike_rate', 'wickets', 'economy', 'team_wickets')
+
+def other_team(match, team):
+    return next((innings.team for innings in match.innings if innings.team != team), None)
+
+# One match worth of rows, in the backend's chunk format
+def make_chunk(rows, width):
+    if numpy is not None:
+        return numpy.array(rows, dtype=numpy.int64).reshape(len(rows), width)
+    return rows
+
+# Columns of many matches' rows. A match whose scorecard changed has its old rows zeroed in place (or
+# dropped when they are the last ones) and its new rows appended, so a live update never rebuilds the
+# table, dead rows only go when Season.build compacts it.
+class Table:
+    def __init__(self, columns, chunks):
+        self.columns = columns
+        # match id -> (first row, end row)
+        self.ranges = {}
+        self.dead = 0
+        self.size = 0
+        if numpy is not None:
+            self._rows = numpy.concatenate([chunk for _, chunk in chunks]) if chunks else \
+                numpy.zeros((0, len(columns)), dtype=numpy.int64)
+            for match_id, chunk in chunks:
+                self.ranges[match_id] = (self.size, self.size + len(chunk))
+                self.size += len(chunk)
+            self._view()
+        else:
+            self.data = {name: array('q') for name in columns}
+            for match_id, chunk in chunks:
+                self.append(match_id, chunk)
+
+    def _view(self):
+        self.data = {name: self._rows[:self.size, index] for index, name in enumerate(self.columns)}
+
+    def append(self, match_id, chunk):
+        start, end = self.size, self.size + len(chunk)
+        if numpy is not None:
+            if end > len(self._rows):
+                grown = numpy.zeros((max(2 * len(self._rows), end), len(self.columns)), dtype=numpy.int64)
+                grown[:start] = self._rows[:start]
+                self._rows = grown
+            self._rows[start:end] = chunk
+        else:
+            for index, name in enumerate(self.columns):
+                self.data[name].extend(row[index] for row in chunk)
+        self.size = end
+        self.ranges[match_id] = (start, end)
+        if numpy is not None:
+            self._view()
+
+    # Zeroed rows add nothing to any sum and their match -1 keeps them out of per-match queries
+    def remove(self, match_id):
+        start, end = self.ranges.pop(match_id)
+        if end == self.size:
+            self.size = start
+            if numpy is not None:
+                self._view()
+            else:
+                for column in self.data.values():
+                    del column[start:]
+            return
+        if numpy is not None:
+            self._rows[start:end] = 0
+            self._rows[start:end, self.columns.index('match')] = -1
+        else:
+            for name, column in self.data.items():
+                column[start:end] = array('q', [-1 if name == 'match' else 0]) * (end - start)
+        self.dead += end - start
+
+    # Per-group sums of each field: {field: sequence indexed by group code}
+    def sums(self, key, fields, groups, match_ids=None):
+        if numpy is not None:
+            mask = numpy.isin(self.data['match'], list(match_ids)) if match_ids is not None else slice(None)
+            keys = self.data[key][mask]
+            return {field: numpy.bincount(keys, weights=self.data[field][mask], minlength=groups).astype(numpy.int64)
+                    for field in fields}
+
+        keys = self.data[key]
+        rows = None
+        if match_ids is not None:
+            match_ids = set(match_ids)
+            rows = [row for row, match_id in enumerate(self.data['match']) if match_id in match_ids]
+        totals = {}
+        for field in fields:
+            total = [0] * groups
+            column = self.data[field]
+            if rows is None:
+                for group, value in zip(keys, column):
+                    total[group] += value
+            else:
+                for row in rows:
+                    total[keys[row]] += column[row]
+            totals[field] = total
+        return totals
+
+# Extends per-group sums with zeros for groups (players, teams) seen since they were computed
+def grow(total, groups):
+    if len(total) >= groups:
+        return total
+    if numpy is not None:
+        return numpy.concatenate([total, numpy.zeros(groups - len(total), dtype=numpy.int64)])
+    total.extend([0] * (groups - len(total)))
+    return total
+
+def rate(numerator, denominator, scale):
+    if numpy is not None:
+        return numpy.divide(numerator * scale, denominator, out=numpy.zeros(len(numerator)), where=denominator > 0)
+    return [value * scale / balls if balls else 0.0 for value, balls in zip(numerator, denominator)]
+
+def at_least(values, minimum):
+    if numpy is not None:
+        return values >= minimum
+    return [value >= minimum for value in values]
+
+# Codes of the best `limit` eligible groups by score, ties broken by the smaller tiebreak
+def top(score, eligible, limit, descending=True, tiebreak=None):
+    if numpy is not None:
+        candidates = numpy.flatnonzero(eligible)
+        keys = [score[candidates] * (-1 if descending else 1)]
+        if tiebreak is not None:
+            keys.insert(0, tiebreak[candidates])
+        return candidates[numpy.lexsort(keys)[:limit]].tolist()
+    sign = -1 if descending else 1
+    candidates = [code for code, ok in enumerate(eligible) if ok]
+    return heapq.nsmallest(limit, candidates,
+                           key=lambda code: (sign * score[code], tiebreak[code] if tiebreak is not None else 0))
+
+# Columnar view of many matches, refreshed from the store when their latest version changes.
+# Season totals are kept up to date match by match, so a live poll costs that match's rows only.
+class Season:
+    def __init__(self):
+        self.players = []
+        self.teams = []
+        self._player_codes = {}
+        self._team_codes = {}
+        # match id -> (version, batting rows, bowling rows)
+        self._chunks = {}
+        self._lock = threading.Lock()
+        # Whole-season per-player and per-team sums: (table columns, key) -> {field: sums}
+        self._totals = {}
+        self.batting = Table(BATTING_COLUMNS, [])
+        self.bowling = Table(BOWLING_COLUMNS, [])
+
+    def _team(self, name):
+        code = self._team_codes.get(name)
+        if code is None:
+            code = self._team_codes[name] = len(self.teams)
+            self.teams.append(name)
+        return code
+
+    def _player(self, name, team):
+        code = self._player_codes.get((name, team))
+        if code is None:
+            code = self._player_codes[(name, team)] = len(self.players)
+            self.players.append((name, team))
+        return code
+
+    def add(self, match_id, version, match):
+        batting, bowling = [], []
+        for innings in match.innings:
+            opponent = other_team(match, innings.team)
+            team = self._team(innings.team)
+            for row in innings.batting:
+                out = 1 if row.dismissal and not row.not_out else 0
+                batting.append((match_id, self._player(row.name, innings.team), team, 1, row.runs or 0,
+                                row.balls or 0, row.fours or 0, row.sixes or 0, out))
+            # Until the other side bats the page doesn't say who is bowling, those rows come in with
+            # the next version of the match
+            if opponent is None:
+                continue
+            fielding = self._team(opponent)
+            for row in innings.bowling:
+                bowling.append((match_id, self._player(row.name, opponent), fielding, 1,
+                                row.balls or 0, row.maidens or 0, row.runs or 0, row.wickets or 0))
+        previous = self._chunks.get(match_id)
+        self._chunks[match_id] = (version, make_chunk(batting, len(BATTING_COLUMNS)),
+                                  make_chunk(bowling, len(BOWLING_COLUMNS)))
+        for table, index in ((self.batting, 1), (self.bowling, 2)):
+            if previous is not None:
+                table.remove(match_id)
+                self._retotal(table, previous[index], -1)
+            table.append(match_id, self._chunks[match_id][index])
+            self._retotal(table, self._chunks[match_id][index], 1)
+        if self.batting.dead + self.bowling.dead > (self.batting.size + self.bowling.size) // 2:
+            self.build()
+
+    # Keeps the cached season sums in step with one match's rows leaving (-1) or arriving (+1)
+    def _retotal(self, table, chunk, sign):
+        for (columns, key), totals in self._totals.items():
+            if columns is not table.columns:
+                continue
+            groups = len(self.players) if key == 'player' else len(self.teams)
+            keys = columns.index(key)
+            for field in totals:
+                total = totals[field] = grow(totals[field], groups)
+                index = columns.index(field)
+                if numpy is not None:
+                    numpy.add.at(total, chunk[:, keys], sign * chunk[:, index])
+                else:
+                    for row in chunk:
+                        total[row[keys]] += sign * row[index]
+
+    # Compacts both tables from the per-match chunks, the cached sums stay valid
+    def build(self):
+        chunks = list(self._chunks.items())
+        self.batting = Table(BATTING_COLUMNS, [(match_id, batting) for match_id, (_, batting, _) in chunks])
+        self.bowling = Table(BOWLING_COLUMNS, [(match_id, bowling) for match_id, (_, _, bowling) in chunks])
+
+    # Reload only the matches whose latest stored version moved, returns True when anything did
+    def refresh(self, store):
+        with self._lock:
+            heads = store.heads()
+            changed = [match_id for match_id, (version, _, _) in heads.items()
+                       if self._chunks.get(match_id, (None,))[0] != version]
+            if not changed:
+                return False
+            for match_id, (version, _, _, match) in store.latest(changed).items():
+                self.add(match_id, version, match)
+            return True
+
+    @property
+    def match_count(self):
+        return len(self._chunks)
+
+    def _batters(self, codes, totals):
+        rows = []
+        for code in codes:
+            name, team = self.players[code]
+            runs, balls, outs = (int(totals[field][code]) for field in ('runs', 'balls', 'outs'))
+            rows.append({'player': name, 'team': team, 'innings': int(totals['innings'][code]), 'runs': runs,
+                         'balls': balls, 'outs': outs, 'average': round(runs / outs, 2) if outs else None,
+                         'strike_rate': round(runs * 100 / balls, 2) if balls else None})
+        return rows
+
+    def _bowlers(self, codes, totals):
+        rows = []
+        for code in codes:
+            name, team = self.players[code]
+            balls, runs, wickets = (int(totals[field][code]) for field in ('balls', 'runs', 'wickets'))
+            rows.append({'player': name, 'team': team, 'innings': int(totals['innings'][code]), 'balls': balls,
+                         'maidens': int(totals['maidens'][code]), 'runs': runs, 'wickets': wickets,
+                         'economy': round(runs * 6 / balls, 2) if balls else None,
+                         'average': round(runs / wickets, 2) if wickets else None})
+        return rows
+
+    def _sums(self, table, key, fields, groups, match_ids):
+        if match_ids is not None:
+            return table.sums(key, fields, groups, match_ids)
+        totals = self._totals.get((table.columns, key))
+        if totals is None:
+            totals = self._totals[(table.columns, key)] = table.sums(key, fields, groups)
+        for field in totals:
+            totals[field] = grow(totals[field], groups)
+        return totals
+
+    def batting_totals(self, match_ids=None):
+        return self._sums(self.batting, 'player', ('innings', 'runs', 'balls', 'outs'), len(self.players), match_ids)
+
+    def bowling_totals(self, match_ids=None):
+        return self._sums(self.bowling, 'player', ('innings', 'balls', 'maidens', 'runs', 'wickets'),
+                          len(self.players), match_ids)
+
+    def most_runs(self, limit=10, match_ids=None):
+        totals = self.batting_totals(match_ids)
+        codes = top(totals['runs'], at_least(totals['innings'], 1), limit, tiebreak=totals['balls'])
+        return self._batters(codes, totals)
+
+    def best_strike_rate(self, limit=10, match_ids=None, min_balls=MIN_BATTING_BALLS):
+        totals = self.batting_totals(match_ids)
+        codes = top(rate(totals['runs'], totals['balls'], 100), at_least(totals['balls'], min_balls), limit)
+        return self._batters(codes, totals)
+
+    def most_wickets(self, limit=10, match_ids=None):
+        totals = self.bowling_totals(match_ids)
+        codes = top(totals['wickets'], at_least(totals['innings'], 1), limit, tiebreak=totals['runs'])
+        return self._bowlers(codes, totals)
+
+    def best_economy(self, limit=10, match_ids=None, min_balls=MIN_BOWLING_BALLS):
+        totals = self.bowling_totals(match_ids)
+        codes = top(rate(totals['runs'], totals['balls'], 6), at_least(totals['balls'], min_balls), limit,
+                    descending=False)
+        return self._bowlers(codes, totals)
+
+    def team_wickets(self, limit=10, match_ids=None):
+        totals = self._sums(self.bowling, 'team', ('wickets', 'runs', 'balls'), len(self.teams), match_ids)
+        codes = top(totals['wickets'], at_least(totals['balls'], 1), limit)
+        return [{'team': self.teams[code], 'wickets': int(totals['wickets'][code]),
+                 'runs': int(totals['runs'][code]), 'balls': int(totals['balls'][code])} for code in codes]
+
+    # Serialised with refresh, which updates the tables and sums in place
+    def leaderboard(self, board, limit=10, match_ids=None):
+        with self._lock:
+            return {
+                'runs': self.most_runs,
+                'strike_rate': self.best_strike_rate,
+                'wickets': self.most_wickets,
+                'economy': self.best_economy,
+                'team_wickets': self.team_wickets,
+            }[board](limit=limit, match_ids=match_ids)
@@ -1,610 +1,1342 @@
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 import requests
-from bs4 import BeautifulSoup
-from flask import Flask, render_template_string, request
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+from flask import Flask, g, jsonify, request
+from markupsafe import Markup
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from aggregate import BOARDS, Season
+from breaker import CircuitBreaker
+from diff import Diff, ScorecardDiffer, innings_delta
+from metrics import registry
+from models import BattingRow, BowlingRow, FallOfWicket, Innings, Match
+from push import PushHub
+from replay import save_recording
+from stats import StatsTracker
+from store import ScoreStore
 
 app = Flask(__name__)
 
-# Function to scrape cricket data
-def scrape_cricket_data():
-    url = 'https://www.cricbuzz.com/live-cricket-scorecard/97212/hyd-vs-guj-elite-group-b-ranji-trophy-elite-2024-25'
-    
+# How often the background poller refreshes the scorecard (seconds)
+SCRAPE_INTERVAL = float(os.environ.get('CRICBLAST_SCRAPE_INTERVAL', 15))
+# Poll interval for finished or not-yet-started matches (seconds)
+IDLE_INTERVAL = float(os.environ.get('CRICBLAST_IDLE_INTERVAL', 300))
+# Snapshots older than this are served as stale, with Age/Warning headers and a banner (seconds)
+MAX_AGE = float(os.environ.get('CRICBLAST_MAX_AGE', 300))
+# Snapshots kept per match for ?since=<version> delta responses
+HISTORY_SIZE = int(os.environ.get('CRICBLAST_HISTORY_SIZE', 32))
+# Rendered pages and JSON bodies kept in memory, each holds the raw, gzip and brotli bytes
+RENDER_CACHE_SIZE = int(os.environ.get('CRICBLAST_RENDER_CACHE_SIZE', 4096))
+# Memory budget of that cache in bytes, least recently used entries go first
+RENDER_CACHE_BYTES = int(os.environ.get('CRICBLAST_RENDER_CACHE_BYTES', 64 * 1024 * 1024))
+# How long browsers and shared caches may reuse a scorecard response without revalidating (seconds)
+CACHE_MAX_AGE = int(os.environ.get('CRICBLAST_CACHE_MAX_AGE', 1))
+# Number of matches fetched and parsed concurrently
+FETCH_WORKERS = int(os.environ.get('CRICBLAST_FETCH_WORKERS', 8))
+# Worker processes for parsing, 0 parses on the scrape threads
+PARSE_PROCESSES = int(os.environ.get('CRICBLAST_PARSE_PROCESSES', 0))
+# Pages allowed in the parse pool at once, scrape threads wait for a slot beyond that
+PARSE_QUEUE_LIMIT = int(os.environ.get('CRICBLAST_PARSE_QUEUE_LIMIT', 2 * PARSE_PROCESSES or 1))
+
+# Upstream timeouts (seconds) and retry policy
+CONNECT_TIMEOUT = float(os.environ.get('CRICBLAST_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.environ.get('CRICBLAST_READ_TIMEOUT', 10))
+FETCH_RETRIES = int(os.environ.get('CRICBLAST_FETCH_RETRIES', 2))
+RETRY_BACKOFF = float(os.environ.get('CRICBLAST_RETRY_BACKOFF', 0.5))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Consecutive failed polls before the upstream circuit opens, and its first and longest cooldown (seconds)
+BREAKER_FAILURES = int(os.environ.get('CRICBLAST_BREAKER_FAILURES', 5))
+BREAKER_COOLDOWN = float(os.environ.get('CRICBLAST_BREAKER_COOLDOWN', 30))
+BREAKER_MAX_COOLDOWN = float(os.environ.get('CRICBLAST_BREAKER_MAX_COOLDOWN', 600))
+# Consecutive unparseable pages before a match stops being fetched, and how long it is left alone (seconds)
+PARSE_FAILURES = int(os.environ.get('CRICBLAST_PARSE_FAILURES', 3))
+PARSE_COOLDOWN = float(os.environ.get('CRICBLAST_PARSE_COOLDOWN', 300))
+
+# Server-Sent Events push channel, CRICBLAST_PUSH_PORT=0 disables it
+PUSH_HOST = os.environ.get('CRICBLAST_PUSH_HOST', '0.0.0.0')
+PUSH_PORT = int(os.environ.get('CRICBLAST_PUSH_PORT', 5001))
+# Public base URL of the push channel when it sits behind a proxy
+PUSH_URL = os.environ.get('CRICBLAST_PUSH_URL', '')
+
+# SQLite file holding the history of every change, empty disables persistence
+STORE_PATH = os.environ.get('CRICBLAST_STORE', 'cricblast.db')
+
+# Process role: 'standalone' polls and serves, in multi-worker mode (serve.py) one 'poller' process
+# scrapes and writes the store while 'web' workers only serve what it stored, 'asgi' is set by asgi.py
+ROLE = os.environ.get('CRICBLAST_ROLE', 'standalone')
+# How often web workers check the store for new snapshots (seconds)
+FOLLOW_INTERVAL = float(os.environ.get('CRICBLAST_FOLLOW_INTERVAL', 1))
+
+# Match states (from the Cricbuzz status line) that only need slow polling
+IDLE_STATES = {'complete', 'preview', 'abandon', 'stump'}
+
+# Upstream base URL, point it at `python replay.py serve` to run without cricbuzz.com
+UPSTREAM = os.environ.get('CRICBLAST_UPSTREAM', 'https://www.cricbuzz.com').rstrip('/')
+# Raw upstream pages are saved here for replay when set
+RECORD_DIR = os.environ.get('CRICBLAST_RECORD_DIR', '')
+
+SCORECARD_URL = UPSTREAM + '/live-cricket-scorecard/{}'
+DEFAULT_URL = UPSTREAM + '/live-cricket-scorecard/97212/hyd-vs-guj-elite-group-b-ranji-trophy-elite-2024-25'
+
+# Match registry (match id -> scorecard URL), e.g.
+# CRICBLAST_MATCHES="97212,97220=https://www.cricbuzz.com/live-cricket-scorecard/97220/slug"
+def load_matches(spec):
+    matches = {}
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        match_id, _, url = entry.partition('=')
+        matches[int(match_id)] = url.strip() or SCORECARD_URL.format(int(match_id))
+    return matches
+
+MATCHES = load_matches(os.environ.get('CRICBLAST_MATCHES', '')) or {97212: DEFAULT_URL}
+DEFAULT_MATCH_ID = next(iter(MATCHES))
+
+# Formats of limited-overs matches (t20, odi), e.g. CRICBLAST_MATCH_FORMATS="97220=t20"
+# Projections and chase figures need the innings length, unlisted matches only get it from a chase line
+def load_formats(spec):
+    formats = {}
+    for entry in spec.split(','):
+        match_id, _, match_format = entry.strip().partition('=')
+        if match_id and match_format:
+            formats[int(match_id)] = match_format.strip().lower()
+    return formats
+
+MATCH_FORMATS = load_formats(os.environ.get('CRICBLAST_MATCH_FORMATS', ''))
+
+# lxml builds trees several times faster than html.parser when it is installed
+try:
+    import lxml  # noqa: F401
+    FAST_TREE_BUILDER = 'lxml'
+except ImportError:
+    FAST_TREE_BUILDER = 'html.parser'
+
+INNINGS_ID_RE = re.compile(r'^innings_\d+$')
+INNINGS_STRAINER = SoupStrainer('div', id=INNINGS_ID_RE)
+
+INNINGS_START_RE = re.compile(r'<div\b[^>]*\bid="innings_(\d+)"')
+DIV_TAG_RE = re.compile(r'<(/?)div\b', re.I)
+STATUS_RE = re.compile(r'class="cb-col cb-col-100 cb-min-stts cb-text-([a-z]+)"[^>]*>(.*?)</div>', re.S)
+
+# Metrics exposed at /metrics
+REQUEST_SECONDS = registry.histogram('cricblast_request_seconds', 'Time spent handling HTTP requests', ('endpoint',))
+SCRAPE_SECONDS = registry.histogram('cricblast_scrape_seconds', 'Fetch and parse time per poll', ('outcome',))
+STAGE_SECONDS = registry.histogram('cricblast_stage_seconds', 'Time spent in each pipeline stage', ('stage',))
+UPSTREAM_RESPONSES = registry.counter('cricblast_upstream_responses_total', 'Upstream fetches by result', ('result',))
+UPSTREAM_ERRORS = registry.counter('cricblast_upstream_errors_total', 'Failed upstream fetches and parses', ('kind',))
+UPSTREAM_RETRIES = registry.counter('cricblast_upstream_retries_total', 'Upstream requests that were retried')
+INNINGS_SECTIONS = registry.counter('cricblast_innings_sections_total',
+                                    'Innings sections per poll, parsed or reused unchanged', ('result',))
+RENDER_CACHE = registry.counter('cricblast_render_cache_total', 'Rendered page lookups by result', ('result',))
+RENDER_CACHE_PURGED = registry.counter('cricblast_render_cache_purged_total',
+                                       'Cached responses dropped by a surrogate key purge')
+DEGRADED_RESPONSES = registry.counter('cricblast_degraded_responses_total',
+                                      'Responses served from a stale last good snapshot', ('endpoint',))
+
+# Shared keep-alive connection pool for all upstream fetches
+session = requests.Session()
+session.headers['User-Agent'] = 'Mozilla/5.0 (compatible; cricblast)'
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=FETCH_WORKERS)
+session.mount('https://', _adapter)
+session.mount('http://', _adapter)
+
+# Last seen validators per URL, used for conditional requests
+Validators = namedtuple('Validators', ['etag', 'last_modified', 'body_hash'])
+validators = {}
+
+def conditional_headers(url):
+    headers = {}
+    previous = validators.get(url)
+    if previous:
+        if previous.etag:
+            headers['If-None-Match'] = previous.etag
+        if previous.last_modified:
+            headers['If-Modified-Since'] = previous.last_modified
+    return headers
+
+def retry_delay(attempt):
+    # Full jitter backoff so parallel fetches don't retry in lockstep
+    return random.uniform(0, RETRY_BACKOFF * 2 ** attempt)
+
+# Retry rule of the sync and asyncio clients: worth another try after `attempt`, status_code is None
+# when the connection failed or timed out
+def should_retry(attempt, status_code=None):
+    return attempt < FETCH_RETRIES and (status_code is None or status_code in RETRY_STATUSES)
+
+# Fetch a scorecard page, returns None when it hasn't changed since the last fetch
+def fetch_scorecard(url):
+    headers = conditional_headers(url)
+    for attempt in range(FETCH_RETRIES + 1):
+        try:
+            response = session.get(url, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            if not should_retry(attempt, response.status_code):
+                break
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if not should_retry(attempt):
+                raise
+        UPSTREAM_RETRIES.inc()
+        time.sleep(retry_delay(attempt))
+    return accept_response(url, response)
+
+# Shared by the sync and async clients: the page text, or None when it is unchanged.
+# Error statuses raise requests' HTTPError whichever client got them, so they are classified alike
+def accept_response(url, response):
+    if response.status_code >= 400:
+        raise requests.exceptions.HTTPError(f"{response.status_code} error for url: {url}", response=response)
+    if response.status_code == 304:
+        UPSTREAM_RESPONSES.inc(result='not_modified')
+        return None
+
+    # Servers that ignore conditional headers still get a cheap body hash check
+    previous = validators.get(url)
+    body_hash = hashlib.sha1(response.content).hexdigest()
+    validators[url] = Validators(response.headers.get('ETag'), response.headers.get('Last-Modified'), body_hash)
+    if previous and previous.body_hash == body_hash:
+        UPSTREAM_RESPONSES.inc(result='unchanged')
+        return None
+    UPSTREAM_RESPONSES.inc(result='changed')
+    if RECORD_DIR:
+        save_recording(RECORD_DIR, url, response.content)
+    return response.text
+
+# Parser backends, all of them produce the same scorecard dict
+def parse_full(html):
+    return BeautifulSoup(html, 'html.parser')
+
+def parse_strained(html):
+    # Only build the tree for the innings blocks, the rest of the page is skipped
+    return BeautifulSoup(html, FAST_TREE_BUILDER, parse_only=INNINGS_STRAINER)
+
+PARSERS = {
+    'strained': parse_strained,
+    'html.parser': parse_full,
+}
+PARSER_BACKEND = os.environ.get('CRICBLAST_PARSER', 'strained')
+# Re-parse only the innings sections whose HTML changed since the last poll, 0 parses whole pages
+INCREMENTAL_PARSE = os.environ.get('CRICBLAST_INCREMENTAL_PARSE', '1') != '0'
+
+def error_kind(error):
+    if isinstance(error, requests.exceptions.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return 'connection'
+    if isinstance(error, requests.exceptions.HTTPError):
+        return 'http'
+    return 'other'
+
+# Only failures of the upstream itself count against the circuit, a 404 for one match doesn't
+def is_outage(error):
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = error.response
+        return response is None or response.status_code >= 500 or response.status_code == 429
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+# Shared by every match: while Cricbuzz is down polls fail fast instead of piling on retries
+upstream_breaker = CircuitBreaker('upstream', BREAKER_FAILURES, BREAKER_COOLDOWN, BREAKER_MAX_COOLDOWN)
+
+def circuit_open_error():
+    return {'error': f"Upstream unavailable, next attempt in {upstream_breaker.retry_in():.0f}s",
+            'kind': 'circuit_open'}
+
+# The steps of a scrape around the fetch and parse, shared with the asyncio client in asgi.py
+
+# A fetch that raised: counted, fed to the upstream breaker and turned into the error dict pollers install
+def fetch_failed(error, started):
+    kind = error_kind(error)
+    UPSTREAM_ERRORS.inc(kind=kind)
+    SCRAPE_SECONDS.observe(time.perf_counter() - started, outcome='error')
+    if is_outage(error):
+        upstream_breaker.failure(str(error))
+    else:
+        upstream_breaker.success()
+    return {'error': f"Failed to retrieve data: {error}", 'kind': kind}
+
+# A fetch that got an answer, an unchanged page (None) ends the scrape here
+def fetch_succeeded(html, started):
+    upstream_breaker.success()
+    if html is None:
+        SCRAPE_SECONDS.observe(time.perf_counter() - started, outcome='unchanged')
+
+# The parsed Match, or the parse error dict, as the outcome of the scrape
+def finish_scrape(data, started):
+    SCRAPE_SECONDS.observe(time.perf_counter() - started, outcome='error' if isinstance(data, dict) else 'changed')
+    return data
+
+# Function to scrape cricket data, returns None when the page is unchanged
+def scrape_cricket_data(url=DEFAULT_URL):
+    if not upstream_breaker.allow():
+        return circuit_open_error()
+    start = time.perf_counter()
     # Handle network errors
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an HTTPError if the response was unsuccessful
+        with STAGE_SECONDS.time(stage='fetch'):
+            html = fetch_scorecard(url)
     except requests.exceptions.RequestException as e:
-        return {'error': f"Failed to retrieve data: {e}"}
-    
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    def get_text_or_none(element, selector=None):
-        if element is None:
-            return "N/A"
-        if selector:
-            el = element.find(selector)
+        return fetch_failed(e, start)
+
+    fetch_succeeded(html, start)
+    if html is None:
+        return None
+    return finish_scrape(parse_page(html, url), start)
+
+# Match state drives the poll rate, read it straight from the markup
+def parse_status(html):
+    status = STATUS_RE.search(html)
+    state = status.group(1) if status else 'unknown'
+    status_text = BeautifulSoup(status.group(2), 'html.parser').text.strip() if status else "N/A"
+    return state, status_text
+
+def parse_innings(html, parser=None):
+    with STAGE_SECONDS.time(stage='parse'):
+        soup = PARSERS[parser or PARSER_BACKEND](html)
+    with STAGE_SECONDS.time(stage='extract'):
+        return extract_innings(soup)
+
+# Turn a scorecard page into the dict the template renders
+def parse_scorecard(html, parser=None):
+    state, status_text = parse_status(html)
+    innings = parse_innings(html, parser)
+    if not innings:
+        UPSTREAM_ERRORS.inc(kind='parse')
+        return {'error': 'Incomplete innings data', 'kind': 'parse'}
+
+    return Match(state, status_text, innings)
+
+# Raw HTML of every innings_N block as (number, html), found by counting div tags instead of
+# building a tree, so telling which innings changed costs a regex scan
+def innings_sections(html):
+    sections = []
+    for start in INNINGS_START_RE.finditer(html):
+        depth = 0
+        for tag in DIV_TAG_RE.finditer(html, start.start()):
+            depth += -1 if tag.group(1) else 1
+            if depth == 0:
+                end = html.find('>', tag.end())
+                if end < 0:
+                    return []
+                sections.append((int(start.group(1)), html[start.start():end + 1]))
+                break
         else:
-            el = element
-        return el.text.strip() if el else "N/A"
-
-    # First innings: Batting and Bowling
-    innings_data = soup.find_all('div', class_='cb-col cb-col-100 cb-ltst-wgt-hdr')
-    
-    if len(innings_data) < 2:
-        return {'error': 'Incomplete innings data'}
-    
-    first_innings_batting = innings_data[0]  # Batting
-    first_innings_bowling = innings_data[1]  # Bowling
-
-    # Second innings: Batting and Bowling (if available)
-    second_innings = soup.find('div', id='innings_2')
-    
-    if second_innings:
-        second_innings_batting = second_innings.find('div', class_='cb-col cb-col-100 cb-ltst-wgt-hdr')
-        second_innings_bowling = second_innings.find_all('div', class_='cb-col cb-col-100 cb-ltst-wgt-hdr')[1]
+            # Unbalanced markup, leave it to the full parse
+            return []
+    return sections
+
+# Per page URL: innings number -> (fingerprint of its HTML, Innings extracted from it)
+innings_cache = {}
+
+# Runs in a parse worker: page text in, compact JSON of the match (or the error dict) out
+def parse_packed(html):
+    data = parse_scorecard(html)
+    return json.dumps(data if isinstance(data, dict) else data.to_dict(), separators=(',', ':')).encode()
+
+# Runs in a parse worker: innings sections in, compact JSON of their Innings out
+def parse_innings_packed(html):
+    return json.dumps([innings.to_dict() for innings in parse_innings(html)], separators=(',', ':')).encode()
+
+def unpack_parsed(payload):
+    values = json.loads(payload)
+    return values if 'error' in values else Match.from_dict(values)
+
+# Keeps BeautifulSoup off the serving interpreter, so a big first-class card can't hold the GIL
+# while pages are being served
+class ParsePool:
+    def __init__(self, processes, queue_limit):
+        self.processes = processes
+        self.waiting = 0
+        self.running = 0
+        self._slots = threading.BoundedSemaphore(queue_limit)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # Workers are spawned, forking a process that runs threads can inherit held locks
+                self._executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _count(self, name, amount):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _run(self, function, html):
+        # Backpressure: with every slot taken, scrape threads wait here instead of queueing pages
+        self._count('waiting', 1)
+        with STAGE_SECONDS.time(stage='parse_wait'):
+            self._slots.acquire()
+        self._count('waiting', -1)
+        self._count('running', 1)
+        try:
+            with STAGE_SECONDS.time(stage='parse'):
+                return self._pool().submit(function, html).result()
+        except BrokenProcessPool:
+            with self._lock:
+                self._executor = None
+            UPSTREAM_ERRORS.inc(kind='parse')
+            raise
+        finally:
+            self._count('running', -1)
+            self._slots.release()
+
+    def parse(self, html):
+        try:
+            data = unpack_parsed(self._run(parse_packed, html))
+        except BrokenProcessPool as e:
+            return {'error': f"Parser process failed: {e}", 'kind': 'parse_pool'}
+        if isinstance(data, dict):
+            UPSTREAM_ERRORS.inc(kind='parse')
+        return data
+
+    def parse_innings(self, html):
+        return [Innings.from_dict(values) for values in json.loads(self._run(parse_innings_packed, html))]
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+parse_pool = ParsePool(PARSE_PROCESSES, PARSE_QUEUE_LIMIT) if PARSE_PROCESSES else None
+
+def parse_page(html, url=None):
+    sections = innings_sections(html) if INCREMENTAL_PARSE and url else []
+    if not sections:
+        return parse_pool.parse(html) if parse_pool else parse_scorecard(html)
+
+    # Only the innings whose HTML changed since the last poll of this page are parsed again,
+    # on a long first-class card the finished innings are reused as they are
+    known = innings_cache.get(url, {})
+    fingerprints = [(number, hashlib.sha1(section.encode()).digest(), section) for number, section in sections]
+    changed = [section for number, fingerprint, section in fingerprints
+               if known.get(number, (None,))[0] != fingerprint]
+    parsed = {}
+    if changed:
+        try:
+            fragment = ''.join(changed)
+            records = parse_pool.parse_innings(fragment) if parse_pool else parse_innings(fragment)
+        except BrokenProcessPool as e:
+            return {'error': f"Parser process failed: {e}", 'kind': 'parse_pool'}
+        parsed = {innings.number: innings for innings in records}
+    INNINGS_SECTIONS.inc(len(changed), result='parsed')
+    INNINGS_SECTIONS.inc(len(sections) - len(changed), result='reused')
+
+    cache = {}
+    for number, fingerprint, _ in fingerprints:
+        innings = parsed[number] if number in parsed else known.get(number, (None, None))[1]
+        if innings is None:
+            # A changed section that didn't extract as an innings, don't trust the split
+            innings_cache.pop(url, None)
+            return parse_pool.parse(html) if parse_pool else parse_scorecard(html)
+        cache[number] = (fingerprint, innings)
+    innings_cache[url] = cache
+    state, status_text = parse_status(html)
+    return Match(state, status_text, sorted((innings for _, innings in cache.values()), key=lambda record: record.number))
+
+def get_text_or_none(element, selector=None):
+    if element is None:
+        return "N/A"
+    if selector:
+        el = element.find(selector)
     else:
-        second_innings_batting, second_innings_bowling = None, None
+        el = element
+    return el.text.strip() if el else "N/A"
 
-    # Extract team names and scores
-    first_innings_team = get_text_or_none(first_innings_batting.find('span'))
-    first_innings_score = get_text_or_none(first_innings_batting.find('span', class_='pull-right'))
+# Scorecard table layouts: row type, (field, column index) per cell, and the minimum column count
+BATTING_TABLE = (BattingRow, (('runs', 2), ('balls', 3), ('fours', 4), ('sixes', 5), ('strike_rate', 6)), 7)
+BOWLING_TABLE = (BowlingRow, (('overs', 1), ('maidens', 2), ('runs', 3), ('wickets', 4), ('nb', 5), ('wd', 6), ('eco', 7)), 8)
 
-    second_innings_team = get_text_or_none(second_innings_batting.find('span')) if second_innings_batting else "N/A"
-    second_innings_score = get_text_or_none(second_innings_batting.find('span', class_='pull-right')) if second_innings_batting else "N/A"
+TABLE_CLASS = 'cb-col cb-col-100 cb-ltst-wgt-hdr'
+ROW_CLASS = 'cb-col cb-col-100 cb-scrd-itms'
+FALL_OF_WICKETS_CLASS = 'cb-col cb-col-100 cb-col-rt cb-font-13'
 
-    # Extract player scores for first innings
-    first_innings_player_scores = []
-    players = first_innings_batting.find_all('div', class_='cb-col cb-col-100 cb-scrd-itms')
-    for player in players:
-        player_columns = player.find_all('div', class_='cb-col')
-        if len(player_columns) < 7:
-            continue
-        first_innings_player_scores.append({
-            'name': get_text_or_none(player.find('a', class_='cb-text-link')),
-            'dismissal': get_text_or_none(player.find('span', class_='text-gray')),
-            'runs': get_text_or_none(player_columns[2]),
-            'balls': get_text_or_none(player_columns[3]),
-            'fours': get_text_or_none(player_columns[4]),
-            'sixes': get_text_or_none(player_columns[5]),
-            'strike_rate': get_text_or_none(player_columns[6])
-        })
-
-    # Extract bowling data for first innings
-    first_innings_bowling_data = []
-    bowlers = first_innings_bowling.find_all('div', class_='cb-col cb-col-100 cb-scrd-itms')
-    for bowler in bowlers:
-        bowler_columns = bowler.find_all('div', class_='cb-col')
-        if len(bowler_columns) < 8:
+def extract_rows(table, layout, with_dismissal=False):
+    row_type, columns, min_columns = layout
+    rows = []
+    if table is None:
+        return rows
+    for row in table.find_all('div', class_=ROW_CLASS):
+        cells = row.find_all('div', class_='cb-col')
+        # Extras, totals and "did not bat" lines have fewer columns
+        if len(cells) < min_columns:
             continue
-        first_innings_bowling_data.append({
-            'name': get_text_or_none(bowler.find('a', class_='cb-text-link')),
-            'overs': get_text_or_none(bowler_columns[1]),
-            'maidens': get_text_or_none(bowler_columns[2]),
-            'runs': get_text_or_none(bowler_columns[3]),
-            'wickets': get_text_or_none(bowler_columns[4]),
-            'nb': get_text_or_none(bowler_columns[5]),
-            'wd': get_text_or_none(bowler_columns[6]),
-            'eco': get_text_or_none(bowler_columns[7])
-        })
-
-    # Extract player scores for second innings
-    second_innings_player_scores = []
-    if second_innings_batting:
-        second_innings_players = second_innings_batting.find_all('div', class_='cb-col cb-col-100 cb-scrd-itms')
-        for player in second_innings_players:
-            player_columns = player.find_all('div', class_='cb-col')
-            if len(player_columns) < 7:
-                continue
-            second_innings_player_scores.append({
-                'name': get_text_or_none(player.find('a', class_='cb-text-link')),
-                'dismissal': get_text_or_none(player.find('span', class_='text-gray')),
-                'runs': get_text_or_none(player_columns[2]),
-                'balls': get_text_or_none(player_columns[3]),
-                'fours': get_text_or_none(player_columns[4]),
-                'sixes': get_text_or_none(player_columns[5]),
-                'strike_rate': get_text_or_none(player_columns[6])
-            })
-
-    # Extract bowling data for second innings
-    second_innings_bowling_data = []
-    if second_innings_bowling:
-        second_innings_bowlers = second_innings_bowling.find_all('div', class_='cb-col cb-col-100 cb-scrd-itms')
-        for bowler in second_innings_bowlers:
-            bowler_columns = bowler.find_all('div', class_='cb-col')
-            if len(bowler_columns) < 8:
-                continue
-            second_innings_bowling_data.append({
-                'name': get_text_or_none(bowler.find('a', class_='cb-text-link')),
-                'overs': get_text_or_none(bowler_columns[1]),
-                'maidens': get_text_or_none(bowler_columns[2]),
-                'runs': get_text_or_none(bowler_columns[3]),
-                'wickets': get_text_or_none(bowler_columns[4]),
-                'nb': get_text_or_none(bowler_columns[5]),
-                'wd': get_text_or_none(bowler_columns[6]),
-                'eco': get_text_or_none(bowler_columns[7])
-            })
-
-    # Extract fall of wickets for both innings
-    first_innings_fall_of_wickets = get_text_or_none(soup.find('div', class_='cb-col cb-col-100 cb-col-rt cb-font-13'))
-    second_innings_fall_of_wickets = get_text_or_none(second_innings.find('div', class_='cb-col cb-col-100 cb-col-rt cb-font-13')) if second_innings else "N/A"
+        values = [get_text_or_none(row.find('a', class_='cb-text-link'))]
+        if with_dismissal:
+            values.append(get_text_or_none(row.find('span', class_='text-gray')))
+        values.extend(get_text_or_none(cells[index]) for _, index in columns)
+        rows.append(row_type.from_text(*values))
+    return rows
 
-    return {
-        'first_innings_team': first_innings_team,
-        'first_innings_score': first_innings_score,
-        'first_innings_player_scores': first_innings_player_scores,
-        'first_innings_fall_of_wickets': first_innings_fall_of_wickets,
-        'first_innings_bowling_data': first_innings_bowling_data,
-        'second_innings_team': second_innings_team,
-        'second_innings_score': second_innings_score,
-        'second_innings_player_scores': second_innings_player_scores,
-        'second_innings_fall_of_wickets': second_innings_fall_of_wickets,
-        'second_innings_bowling_data': second_innings_bowling_data
-    }
+# Walk every innings_N block once: batting table, fall of wickets, bowling table
+def extract_innings_block(block, number):
+    tables = []
+    fall_of_wickets = None
+    for child in block.find_all('div', recursive=False):
+        classes = ' '.join(child.get('class', ()))
+        if classes == TABLE_CLASS:
+            tables.append(child)
+        elif classes == FALL_OF_WICKETS_CLASS and fall_of_wickets is None:
+            fall_of_wickets = child
+    batting = tables[0] if tables else None
+    bowling = tables[1] if len(tables) > 1 else None
+    return Innings.from_text(
+        number,
+        get_text_or_none(batting.find('span')) if batting else "N/A",
+        get_text_or_none(batting.find('span', class_='pull-right')) if batting else "N/A",
+        extract_rows(batting, BATTING_TABLE, with_dismissal=True),
+        extract_rows(bowling, BOWLING_TABLE),
+        get_text_or_none(fall_of_wickets),
+    )
 
-# Flask route to display paginated scorecard pages
+def extract_innings(soup):
+    innings = []
+    for block in soup.find_all('div', id=INNINGS_ID_RE):
+        number = int(block['id'].rpartition('_')[2])
+        innings.append(extract_innings_block(block, number))
+    innings.sort(key=lambda record: record.number)
+    return innings
+
+# Static assets are served with a content hash in the URL and cached for a year
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 365 * 24 * 3600
+
+def hash_assets():
+    urls = {}
+    for name in sorted(os.listdir(app.static_folder)):
+        with open(os.path.join(app.static_folder, name), 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        urls[name] = f"{app.static_url_path}/{name}?v={digest}"
+    return urls
+
+asset_urls = hash_assets()
+
+@app.after_request
+def immutable_assets(response):
+    if request.endpoint == 'static' and 'v' in request.args:
+        response.headers['Cache-Control'] = f"public, max-age={app.config['SEND_FILE_MAX_AGE_DEFAULT']}, immutable"
+    return response
+
+# A rendered page or JSON body with its compressed variants, built once per (match, page, snapshot version)
+# tags are the surrogate keys the entry is purged by, the ETag defaults to a hash of the body
+class RenderedPage:
+    def __init__(self, body, content_type='text/html; charset=utf-8', tags=(), etag=None):
+        self.body = body.encode('utf-8') if isinstance(body, str) else body
+        self.content_type = content_type
+        self.tags = tuple(tags)
+        self.etag = etag or hashlib.sha1(self.body).hexdigest()[:20]
+        self.gzip = gzip.compress(self.body, 6)
+        self.brotli = brotli.compress(self.body, quality=5) if brotli else None
+
+    @property
+    def size(self):
+        return len(self.body) + len(self.gzip) + len(self.brotli or b'')
+
+    def response(self, accept_encoding):
+        headers = {'Content-Type': self.content_type, 'Vary': 'Accept-Encoding'}
+        if self.brotli and 'br' in accept_encoding:
+            body = self.brotli
+            headers['Content-Encoding'] = 'br'
+        elif 'gzip' in accept_encoding:
+            body = self.gzip
+            headers['Content-Encoding'] = 'gzip'
+        else:
+            body = self.body
+        return app.response_class(body, headers=headers)
+
+# Shared by every request thread, bounded by entry count and by bytes
+class RenderCache:
+    def __init__(self, size=RENDER_CACHE_SIZE, budget=RENDER_CACHE_BYTES):
+        self.size = size
+        self.budget = budget
+        self.bytes = 0
+        self._pages = OrderedDict()
+        # surrogate key -> cache keys of the entries tagged with it
+        self._tagged = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            rendered = self._pages.get(key)
+            if rendered is not None:
+                self._pages.move_to_end(key)
+            return rendered
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._tagged.clear()
+            self.bytes = 0
+
+    def _drop(self, key):
+        rendered = self._pages.pop(key)
+        self.bytes -= rendered.size
+        for tag in rendered.tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def put(self, key, rendered):
+        if isinstance(rendered, str):
+            rendered = RenderedPage(rendered)
+        with self._lock:
+            if key in self._pages:
+                self._drop(key)
+            self._pages[key] = rendered
+            self.bytes += rendered.size
+            for tag in rendered.tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while self._pages and (len(self._pages) > self.size or self.bytes > self.budget):
+                self._drop(next(iter(self._pages)))
+        return rendered
+
+    # Drop every entry tagged with any of the surrogate keys, returns how many went
+    def purge(self, *tags):
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tagged.get(tag, ()))
+            for key in keys:
+                self._drop(key)
+        RENDER_CACHE_PURGED.inc(len(keys))
+        return len(keys)
+
+render_cache = RenderCache()
+
+# Template filter for numeric fields that failed to parse
+@app.template_filter('na')
+def format_stat(value, fmt=None):
+    if value is None:
+        return "N/A"
+    return fmt % value if fmt else value
+
+# Compiled once at startup and rendered straight from the environment's cache
+scorecard_template = app.jinja_env.get_template('scorecard.html')
+app_template = app.jinja_env.get_template('match_app.html')
+
+# Immutable parsed scorecard shared by every request handler
+# innings_versions maps each innings number to the version in which it last changed
+# stats maps each innings number to its derived InningsStats
+Snapshot = namedtuple('Snapshot', ['data', 'fetched_at', 'version', 'innings_versions', 'stats'])
+
+# Per-match refresh state, holds the latest snapshot for one scorecard
+class ScorePoller:
+    def __init__(self, match_id, url, max_age=MAX_AGE, on_publish=None):
+        self.match_id = match_id
+        self.url = url
+        self.on_publish = on_publish
+        self.max_age = max_age
+        self.snapshot = None
+        self.error = None
+        self.last_attempt = 0.0
+        self.next_due = 0.0
+        self.in_flight = False
+        # Recent snapshots, so API clients can ask for changes since a version
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.differ = ScorecardDiffer()
+        self.stats = StatsTracker(MATCH_FORMATS.get(match_id))
+        # Opens when the page keeps coming back unparseable, most likely a markup change upstream
+        self.parse_breaker = CircuitBreaker(f"parse-{match_id}", PARSE_FAILURES, PARSE_COOLDOWN)
+
+    def interval(self):
+        # Live matches poll fast, finished or not-yet-started ones rarely
+        state = self.snapshot.data.state if self.snapshot else None
+        return IDLE_INTERVAL if state in IDLE_STATES else SCRAPE_INTERVAL
+
+    def refresh(self):
+        self.last_attempt = time.time()
+        if not self.held_back():
+            self.apply(scrape_cricket_data(self.url))
+
+    # A match whose page layout broke isn't fetched again until its parse circuit half-opens
+    def held_back(self):
+        if self.parse_breaker.allow():
+            return False
+        self.next_due = time.time() + max(self.interval(), self.parse_breaker.retry_in())
+        return True
+
+    # Install a scrape result: an error dict, a new Match, or None for an unchanged page
+    def apply(self, data):
+        if isinstance(data, dict):
+            # Scrape errors come back as {'error': message, 'kind': kind}
+            # The last good snapshot keeps being served, marked with its age once it goes stale
+            self.error = data['error']
+            if data.get('kind') == 'parse':
+                self.parse_breaker.failure(data['error'])
+                # The same broken page must be parsed again next time, not taken as unchanged
+                validators.pop(self.url, None)
+        elif data is not None:
+            self.parse_breaker.success()
+            self.publish(data)
+        elif self.snapshot:
+            # Upstream page unchanged, the current snapshot is fresh again
+            self.snapshot = self.snapshot._replace(fetched_at=time.time())
+            self.error = None
+        self.next_due = time.time() + self.interval()
+
+    def publish(self, data):
+        previous = self.snapshot
+        self.error = None
+        if previous is None:
+            diff = Diff([], [innings.number for innings in data.innings])
+        else:
+            with STAGE_SECONDS.time(stage='diff'):
+                diff = self.differ.diff(previous.data, data)
+            if not diff.events and not diff.changed_innings:
+                # Page bytes changed but the scorecard didn't (ads, timestamps), keep the version
+                self.snapshot = previous._replace(fetched_at=time.time())
+                return
+
+        # Versions are publish times in ms, so they stay unique across restarts
+        version = int(time.time() * 1000)
+        if previous and version <= previous.version:
+            version = previous.version + 1
+        innings_versions = dict(previous.innings_versions) if previous else {}
+        for number in diff.changed_innings:
+            innings_versions[number] = version
+
+        # Publishing is a single reference swap, readers never see a partial update
+        stats = self.stats.update(data, diff.changed_innings)
+        self.snapshot = Snapshot(data, time.time(), version, innings_versions, stats)
+        self.history.append(self.snapshot)
+        if self.on_publish:
+            self.on_publish(self, previous, self.snapshot, diff)
+
+    def snapshot_at(self, version):
+        for snapshot in self.history:
+            if snapshot.version == version:
+                return snapshot
+        return None
+
+# Fetches and parses every registered match on a bounded worker pool
+class MatchScheduler:
+    def __init__(self, registry, workers=FETCH_WORKERS):
+        self.pollers = {match_id: ScorePoller(match_id, url, on_publish=self._publish)
+                        for match_id, url in registry.items()}
+        self.workers = workers
+        # Called as listener(poller, previous, snapshot, diff) whenever a match changes
+        self.listeners = []
+        # Called as listener(poller) after every refresh attempt, changed or not
+        self.refresh_listeners = []
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pool = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scrape')
+                self._thread = threading.Thread(target=self._run, name='match-scheduler', daemon=True)
+                self._thread.start()
+
+    # Stop scheduling new polls and wait for in-flight ones to finish
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wake.set()
+        with self._lock:
+            thread, pool = self._thread, self._pool
+        if thread is not None:
+            thread.join(timeout)
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            now = time.time()
+            next_due = now + SCRAPE_INTERVAL
+            for poller in list(self.pollers.values()):
+                if poller.in_flight:
+                    continue
+                if poller.next_due <= now:
+                    poller.in_flight = True
+                    self._pool.submit(self._refresh, poller)
+                else:
+                    next_due = min(next_due, poller.next_due)
+            self._wake.wait(max(0.05, next_due - time.time()))
+            self._wake.clear()
+
+    def _publish(self, poller, previous, snapshot, diff):
+        for listener in self.listeners:
+            listener(poller, previous, snapshot, diff)
+
+    def _refresh(self, poller):
+        try:
+            poller.refresh()
+        except Exception as e:
+            poller.error = f"Failed to refresh match {poller.match_id}: {e}"
+            poller.next_due = time.time() + poller.interval()
+        try:
+            for listener in self.refresh_listeners:
+                listener(poller)
+        finally:
+            poller.in_flight = False
+            self._wake.set()
+
+    def current(self, match_id):
+        # Stale-while-revalidate: return what we have and nudge the scheduler if it is old
+        poller = self.pollers[match_id]
+        snapshot = poller.snapshot
+        now = time.time()
+        interval = poller.interval()
+        if snapshot is None or now - snapshot.fetched_at > interval:
+            if not poller.in_flight and now - poller.last_attempt > interval:
+                poller.next_due = now
+                self._wake.set()
+        # Past max_age this is the last good snapshot, served in degraded mode
+        return snapshot
+
+scheduler = MatchScheduler(MATCHES)
+
+# Flask route for the default match
 @app.route('/')
 def home():
+    return match_page(DEFAULT_MATCH_ID)
+
+# Flask route to display paginated scorecard pages
+@app.route('/match/<int:match_id>')
+def match_page(match_id):
+    if match_id not in scheduler.pollers:
+        return f"Unknown match {match_id}", 404
+
     # Get the current page from query parameters, default to 1
-    page = int(request.args.get('page', 1))
-
-    # Scrape the data
-    data = scrape_cricket_data()
-
-    # If there's an error during scraping, show the error message
-    if 'error' in data:
-        return data['error']
-
-    # HTML template for displaying the data
-    html_template = """<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Cricket Scorecard - Enhanced Visuals</title>
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@400;600&family=Roboto+Slab:wght@400;700&display=swap');
-        
-        /* Background Animation */
-        @keyframes bgAnimation {
-            0% { background-color: #0B192C; }
-            25% { background-color: #1E3E62; }
-            50% { background-color: #0B192C; }
-            75% { background-color: #FF6500; }
-            100% { background-color: #1E3E62; }
-        }
-
-        body {
-            margin: 0;
-            padding: 0;
-            font-family: 'Poppins', sans-serif;
-            color: #dcdcdc;
-            width: 90%;
-            margin: auto;
-            transition: all 0.5s ease;
-            overflow-x: hidden;
-            background-color: #0B192C;
-            animation: bgAnimation 15s infinite alternate ease-in-out;
-        }
-
-        .team-score-wrapper {
-            position: fixed;
-            top: 0;
-            left: 91px;
-            width: 88%;
-            background-color: #0b182b;
-            height: 30px;
-            z-index: 999;
-            margin: auto;
-            opacity: 0;
-            animation: fadeInTeamScore 2s ease 1s forwards;
-        }
-
-        @keyframes fadeInTeamScore {
-            0% { opacity: 0; transform: translateY(-20px); }
-            100% { opacity: 1; transform: translateY(0); }
-        }
-
-        .team-score {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            width: 100%;
-            max-width: 1200px;
-            padding: 25px;
-            background: linear-gradient(135deg, #FF6500, #1E3E62);
-            border-radius: 10px;
-            margin-bottom: 20px;
-            box-shadow: 0 8px 20px rgba(0, 0, 0, 0.8);
-            color: #fff;
-            position: sticky;
-            top: 30px;
-            z-index: 1000;
-            overflow: hidden;
-            font-family: 'Roboto Slab', serif;
-            animation: fadeInScore 2s ease;
-        }
-
-        @keyframes fadeInScore {
-            0% { opacity: 0; transform: translateY(-30px); }
-            100% { opacity: 1; transform: translateY(0); }
-        }
-
-        .team-name {
-            font-size: 60px;
-            font-weight: 700;
-            letter-spacing: 3px;
-            font-style: italic;
-            text-transform: uppercase;
-            color: #FFF;
-            text-shadow: 0 4px 8px rgba(255, 101, 0, 0.7);
-        }
-
-        .score {
-            font-size: 56px;
-            font-weight: bold;
-            font-style: italic;
-            text-align: right;
-            color: #FFF;
-            text-shadow: 0 4px 8px rgba(30, 62, 98, 0.7);
-        }
-
-        .container {
-            padding-top: 32px;
-            padding-bottom: 25px;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            flex-direction: column;
-            width: 100%;
-            background-color: rgb(12, 24, 42);
-            border-radius: 15px;
-            box-shadow: 0 15px 40px rgba(0, 0, 0, 0.6);
-            position: relative;
-            z-index: 1;
-            animation: fadeIn 2s ease-in-out;
-        }
-
-        .player-scores, .fall-of-wickets, .bowling-scores {
-            width: 100%;
-            max-width: 1200px;
-            margin-top: 12px;
-            margin-bottom: 20px;
-            background-color: rgba(30, 62, 98, 0.95);
-            border-radius: 10px;
-            padding: 20px;
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.5);
-            border: 1px solid rgba(255, 101, 0, 0.4);
-            opacity: 0.9; /* Added opacity */
-            animation: fadeInSection 2s ease-in-out; /* Smooth fade-in for sections */
-        }
-
-        @keyframes fadeInSection {
-            0% { opacity: 0; transform: translateY(20px); }
-            100% { opacity: 1; transform: translateY(0); }
-        }
-
-        /* Table */
-        table {
-            width: 100%;
-            border-collapse: collapse;
-            background-color: rgba(51, 51, 51, 0.9);
-            border-radius: 10px;
-            overflow: hidden;
-            box-shadow: 0 6px 15px rgba(0, 0, 0, 0.5);
-        }
-
-        th, td {
-            padding: 20px;
-            text-align: center;
-            border-bottom: 1px solid #555;
-            font-size: 22px;
-            color: #f0f0f0;
-            transition: transform 0.3s ease;
-            font-family: 'Poppins', sans-serif;
-            cursor: pointer;
-        }
-
-        th {
-            background-color: rgba(68, 68, 68, 0.8);
-            color: #ffd700;
-            font-weight: 700;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-            box-shadow: 0 4px 10px rgba(0, 0, 0, 0.5);
-        }
-
-        td:hover {
-            transform: scale(1.05);
-            background-color: rgba(85, 85, 85, 0.9);
-            box-shadow: 0 0 15px rgba(255, 215, 0, 0.5);
-        }
-
-        /* Subheader Styling (Same as Fall of Wickets) */
-        h3 {
-            color: #ffb400;
-            font-size: 28px;
-            font-weight: bold;
-            text-transform: uppercase;
-            letter-spacing: 1.5px;
-            text-align: center;
-            text-shadow: 3px 3px 6px rgba(0, 0, 0, 0.7);
-            margin-bottom: 10px;
-            margin-top: -12px;
-        }
-
-        .fall-of-wickets-content {
-            margin-top: 20px;
-            padding: 15px;
-            border-radius: 10px;
-            background-color: rgba(51, 51, 51, 0.95);
-            color: #ffd700;
-            font-size: 24px;
-            text-align: center;
-            max-width: 1200px;
-            box-shadow: 0 4px 10px rgba(0, 0, 0, 0.5);
-            text-shadow: 2px 2px 4px rgba(0, 0, 0, 0.5);
-        }
-
-        .fall-of-wickets-content h3 {
-            color: #ffb400;
-            font-size: 28px;
-            font-weight: bold;
-            text-transform: uppercase;
-            letter-spacing: 1.5px;
-            text-shadow: 3px 3px 6px rgba(0, 0, 0, 0.7);
-            margin-bottom: 15px;
-        }
-
-        /* Player Modal Styling */
-        .modal {
-            display: none;
-            position: fixed;
-            z-index: 1001;
-            left: 50%;
-            top: 50%;
-            transform: translate(-50%, -50%);
-            background-color: rgba(30, 62, 98, 0.95);
-            border-radius: 15px;
-            width: 50%;
-            max-width: 600px;
-            padding: 30px;
-            box-shadow: 0 15px 30px rgba(0, 0, 0, 0.5);
-        }
-
-        .modal-content {
-            color: #fff;
-            font-size: 22px;
-            text-align: center;
-        }
-
-        .modal-header {
-            font-size: 28px;
-            font-weight: bold;
-            margin-bottom: 20px;
-        }
-
-        .modal-close {
-            position: absolute;
-            top: 15px;
-            right: 20px;
-            font-size: 24px;
-            cursor: pointer;
-            color: #ffd700;
-        }
-    </style>
-    <script>
-        // Modal handling
-        function showPlayerDetails(playerName, dismissal, runs, balls, fours, sixes, strikeRate) {
-            const modal = document.getElementById('playerModal');
-            const modalContent = document.getElementById('modalContent');
-            modal.style.display = 'block';
-            modalContent.innerHTML = `
-                <div class="modal-header">${playerName}</div>
-                <div>Dismissal: ${dismissal}</div>
-                <div>Runs: ${runs}</div>
-                <div>Balls: ${balls}</div>
-                <div>Fours: ${fours}</div>
-                <div>Sixes: ${sixes}</div>
-                <div>Strike Rate: ${strikeRate}</div>
-            `;
-        }
-
-        function closeModal() {
-            const modal = document.getElementById('playerModal');
-            modal.style.display = 'none';
-        }
-
-        // Arrow key navigation
-        document.addEventListener('DOMContentLoaded', function () {
-            document.addEventListener('keydown', function (event) {
-                let currentPage = {{ page }};
-                if (event.key === 'ArrowRight') {
-                    let nextPage = currentPage < 4 ? currentPage + 1 : 1;
-                    window.location.href = `/?page=${nextPage}`;
-                } else if (event.key === 'ArrowLeft') {
-                    let previousPage = currentPage > 1 ? currentPage - 1 : 4;
-                    window.location.href = `/?page=${previousPage}`;
-                }
-            });
-        });
-    </script>
-</head>
-<body>
-    <div class="team-score-wrapper"></div> <!-- Fixed padding to fill the gap -->
-    <div class="container">
-        {% if page == 1 %}
-        <div class="team-score">
-            <div class="team-name">{{ first_innings_team.replace('Innings', '').strip() }}</div>
-            <div class="score">{{ first_innings_score }}</div>
-        </div>
-        <div class="player-scores">
-            <h3>Batting</h3>
-            <table>
-                <thead>
-                    <tr>
-                        <th>Player</th>
-                        <th>Dismissal</th>
-                        <th class="highlight">R</th>
-                        <th>B</th>
-                        <th>4s</th>
-                        <th>6s</th>
-                        <th>SR</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {% for player in first_innings_player_scores %}
-                    <tr onclick="showPlayerDetails('{{ player.name }}', '{{ player.dismissal }}', '{{ player.runs }}', '{{ player.balls }}', '{{ player.fours }}', '{{ player.sixes }}', '{{ player.strike_rate }}')">
-                        <td>{{ player.name }}</td>
-                        <td>{{ player.dismissal }}</td>
-                        <td class="highlight">{{ player.runs }}</td>
-                        <td>{{ player.balls }}</td>
-                        <td>{{ player.fours }}</td>
-                        <td>{{ player.sixes }}</td>
-                        <td>{{ player.strike_rate }}</td>
-                    </tr>
-                    {% endfor %}
-                </tbody>
-            </table>
-        </div>
-        <div class="fall-of-wickets-content">
-            <h3>Fall of Wickets</h3>
-            <p>Fall of Wickets: {{ first_innings_fall_of_wickets }}</p>
-        </div>
-        {% elif page == 2 %}
-        <div class="team-score">
-            <div class="team-name">{{ first_innings_team.replace('Innings', '').strip() }}</div>
-            <div class="score">{{ first_innings_score }}</div>
-        </div>
-        <div class="bowling-scores">
-            <h3>Bowling</h3>
-            <table>
-                <thead>
-                    <tr>
-                        <th>Bowler</th>
-                        <th>O</th>
-                        <th>M</th>
-                        <th>R</th>
-                        <th>W</th>
-                        <th>NB</th>
-                        <th>WD</th>
-                        <th>ECO</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {% for bowler in first_innings_bowling_data %}
-                    <tr>
-                        <td>{{ bowler.name }}</td>
-                        <td>{{ bowler.overs }}</td>
-                        <td>{{ bowler.maidens }}</td>
-                        <td>{{ bowler.runs }}</td>
-                        <td>{{ bowler.wickets }}</td>
-                        <td>{{ bowler.nb }}</td>
-                        <td>{{ bowler.wd }}</td>
-                        <td>{{ bowler.eco }}</td>
-                    </tr>
-                    {% endfor %}
-                </tbody>
-            </table>
-        </div>
-        {% elif page == 3 %}
-        <div class="team-score">
-            <div class="team-name">{{ second_innings_team.replace('Innings', '').strip() }}</div>
-            <div class="score">{{ second_innings_score }}</div>
-        </div>
-        <div class="player-scores">
-            <h3>Batting</h3>
-            <table>
-                <thead>
-                    <tr>
-                        <th>Player</th>
-                        <th>Dismissal</th>
-                        <th class="highlight">R</th>
-                        <th>B</th>
-                        <th>4s</th>
-                        <th>6s</th>
-                        <th>SR</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {% for player in second_innings_player_scores %}
-                    <tr onclick="showPlayerDetails('{{ player.name }}', '{{ player.dismissal }}', '{{ player.runs }}', '{{ player.balls }}', '{{ player.fours }}', '{{ player.sixes }}', '{{ player.strike_rate }}')">
-                        <td>{{ player.name }}</td>
-                        <td>{{ player.dismissal }}</td>
-                        <td class="highlight">{{ player.runs }}</td>
-                        <td>{{ player.balls }}</td>
-                        <td>{{ player.fours }}</td>
-                        <td>{{ player.sixes }}</td>
-                        <td>{{ player.strike_rate }}</td>
-                    </tr>
-                    {% endfor %}
-                </tbody>
-            </table>
-        </div>
-        <div class="fall-of-wickets-content">
-            <h3>Fall of Wickets</h3>
-            <p>Fall of Wickets: {{ second_innings_fall_of_wickets }}</p>
-        </div>
-        {% elif page == 4 %}
-        <div class="team-score">
-            <div class="team-name">{{ second_innings_team.replace('Innings', '').strip() }}</div>
-            <div class="score">{{ second_innings_score }}</div>
-        </div>
-        <div class="bowling-scores">
-            <h3>Bowling</h3>
-            <table>
-                <thead>
-                    <tr>
-                        <th>Bowler</th>
-                        <th>O</th>
-                        <th>M</th>
-                        <th>R</th>
-                        <th>W</th>
-                        <th>NB</th>
-                        <th>WD</th>
-                        <th>ECO</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {% for bowler in second_innings_bowling_data %}
-                    <tr>
-                        <td>{{ bowler.name }}</td>
-                        <td>{{ bowler.overs }}</td>
-                        <td>{{ bowler.maidens }}</td>
-                        <td>{{ bowler.runs }}</td>
-                        <td>{{ bowler.wickets }}</td>
-                        <td>{{ bowler.nb }}</td>
-                        <td>{{ bowler.wd }}</td>
-                        <td>{{ bowler.eco }}</td>
-                    </tr>
-                    {% endfor %}
-                </tbody>
-            </table>
-        </div>
-        {% endif %}
-    </div>
-
-    <!-- Modal for Player Details -->
-    <div id="playerModal" class="modal">
-        <span class="modal-close" onclick="closeModal()">&times;</span>
-        <div id="modalContent" class="modal-content"></div>
-    </div>
-</body>
-</html>
-"""
-
-    return render_template_string(
-        html_template,
+    page = request.args.get('page', 1, type=int)
+
+    # Read the latest snapshot published by the background scheduler
+    start_background()
+    snapshot = scheduler.current(match_id)
+
+    if snapshot is None:
+        return unavailable(match_id)
+
+    age = staleness(match_id, snapshot)
+    response = serve_cached(render_page(match_id, snapshot, page, request.path, stale=age is not None))
+    return mark_stale(response, age) if age is not None else response
+
+# Conditional, compressed response for a cache entry, shared by the pages and the JSON API
+def serve_cached(rendered):
+    if request.if_none_match.contains_weak(rendered.etag):
+        response = app.response_class(status=304)
+    else:
+        response = rendered.response(request.headers.get('Accept-Encoding', ''))
+    return cache_headers(response, rendered.etag, rendered.tags)
+
+def cache_headers(response, etag, tags):
+    # Weak validators: the gzip, brotli and identity bodies of an entry share one ETag
+    response.set_etag(etag, weak=True)
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Shared caches and browsers reuse a response for at most CACHE_MAX_AGE, then revalidate
+    response.headers['Cache-Control'] = f"public, max-age={CACHE_MAX_AGE}"
+    # For a CDN in front: purge by these keys when the match changes
+    response.headers['Surrogate-Key'] = ' '.join(tags)
+    return response
+
+# Surrogate keys: everything about a match, one innings of it, or built from the whole match
+def match_tag(match_id):
+    return f"match-{match_id}"
+
+def innings_tag(match_id, number):
+    return f"match-{match_id}-innings-{number}"
+
+def latest_tag(match_id):
+    return f"match-{match_id}-latest"
+
+# Nothing good to fall back on yet, upstream details stay in the logs and metrics
+def unavailable(match_id):
+    if scheduler.pollers[match_id].error:
+        message = 'Scorecard is temporarily unavailable, please try again shortly'
+    else:
+        message = 'Scorecard is loading, please refresh in a few seconds'
+    return message, 503, {'Retry-After': str(int(SCRAPE_INTERVAL))}
+
+# Age of a snapshot served in degraded mode, None while the match is being kept up to date
+def staleness(match_id, snapshot):
+    poller = scheduler.pollers[match_id]
+    age = time.time() - snapshot.fetched_at
+    # Idle matches poll rarely, being one poll behind is not an outage
+    if age > max(poller.max_age, 2 * poller.interval()) or (poller.error and age > poller.interval()):
+        return age
+    return None
+
+def mark_stale(response, age):
+    DEGRADED_RESPONSES.inc(endpoint=request.endpoint)
+    response.headers['Age'] = str(int(age))
+    response.headers['Warning'] = '110 - "Response is Stale"'
+    return response
+
+# Single-payload mode: the whole match in one compressed response, every page is drawn in the
+# browser so paging between batting and bowling needs no request at all
+@app.route('/match/<int:match_id>/app')
+def match_app(match_id):
+    if match_id not in scheduler.pollers:
+        return f"Unknown match {match_id}", 404
+    start_background()
+    snapshot = scheduler.current(match_id)
+    if snapshot is None:
+        return unavailable(match_id)
+
+    age = staleness(match_id, snapshot)
+    # One entry per version serves every page, the client picks the page from ?page=
+    key = (match_id, 'app', snapshot.version, snapshot.fetched_at if age is not None else None)
+    rendered = cached_render(key, lambda: RenderedPage(
+        render_app(match_id, snapshot, request.path, age is not None),
+        tags=(match_tag(match_id), latest_tag(match_id))))
+    response = serve_cached(rendered)
+    return mark_stale(response, age) if age is not None else response
+
+# Rows go out as arrays in PACKED_COLUMNS order instead of one object per row
+PACKED_COLUMNS = {
+    'batting': BattingRow.__slots__,
+    'bowling': BowlingRow.__slots__,
+    'fall_of_wickets': FallOfWicket.__slots__,
+}
+
+def packed_match(match_id, snapshot):
+    innings = []
+    for item in snapshot.data.innings:
+        entry = {name: getattr(item, name) for name in ('number', 'team', 'score', 'runs', 'wickets', 'balls')}
+        for table, columns in PACKED_COLUMNS.items():
+            entry[table] = [[getattr(row, column) for column in columns] for row in getattr(item, table)]
+        stats = snapshot.stats.get(item.number)
+        entry['stats'] = stats.to_dict() if stats else None
+        innings.append(entry)
+    return {
+        'match_id': match_id,
+        'version': snapshot.version,
+        'state': snapshot.data.state,
+        'status': snapshot.data.status,
+        'columns': PACKED_COLUMNS,
+        'innings': innings,
+    }
+
+def render_app(match_id, snapshot, base_url, stale=False):
+    # Embedded in a script tag, so "<" is escaped to keep "</script>" in a name from closing it
+    payload = json.dumps(packed_match(match_id, snapshot), separators=(',', ':')).replace('<', '\\u003c')
+    return app_template.render(
+        payload=Markup(payload),
+        stale_since=time.strftime('%H:%M UTC on %d %b', time.gmtime(snapshot.fetched_at)) if stale else None,
+        asset_urls=asset_urls,
+        client_config={
+            'baseUrl': base_url,
+            'matchId': match_id,
+            'pushPort': PUSH_PORT,
+            'pushUrl': PUSH_URL,
+            'staleSince': snapshot.fetched_at if stale else None,
+        },
+    )
+
+# Two pages per innings (batting then bowling), returns the clamped page and its innings
+def page_position(snapshot, page):
+    page_count = 2 * len(snapshot.data.innings)
+    page = min(max(page, 1), page_count)
+    innings_number = snapshot.data.innings[(page - 1) // 2].number
+    innings_version = snapshot.innings_versions.get(innings_number, snapshot.version)
+    return page, page_count, innings_number, innings_version
+
+# Render one scorecard page of a snapshot, or reuse the cached bytes
+def render_page(match_id, snapshot, page, base_url, stale=False):
+    # Identical pages are served from pre-rendered, pre-compressed bytes until their innings
+    # changes, so a new ball in innings 4 leaves the cached pages of innings 1-3 valid
+    # Degraded pages carry the fetch time in their banner, and so in their key
+    page, page_count, innings_number, innings_version = page_position(snapshot, page)
+    # The live innings' stats also follow the status line, its pages are keyed by match version
+    if innings_number == snapshot.data.innings[-1].number:
+        innings_version = snapshot.version
+    key = (match_id, page, page_count, innings_version, base_url, snapshot.fetched_at if stale else None)
+    return cached_render(key, lambda: RenderedPage(
+        render_html(match_id, snapshot, page, base_url, stale),
+        tags=(match_tag(match_id), innings_tag(match_id, innings_number))))
+
+def cached_render(key, build):
+    rendered = render_cache.get(key)
+    if rendered is None:
+        RENDER_CACHE.inc(result='miss')
+        with STAGE_SECONDS.time(stage='render'):
+            rendered = render_cache.put(key, build())
+    else:
+        RENDER_CACHE.inc(result='hit')
+    return rendered
+
+def render_html(match_id, snapshot, page, base_url, stale=False):
+    page, page_count, innings_number, innings_version = page_position(snapshot, page)
+    return scorecard_template.render(
         page=page,
-        first_innings_team=data['first_innings_team'],
-        first_innings_score=data['first_innings_score'],
-        first_innings_player_scores=data['first_innings_player_scores'],
-        first_innings_fall_of_wickets=data['first_innings_fall_of_wickets'],
-        first_innings_bowling_data=data['first_innings_bowling_data'],
-        second_innings_team=data['second_innings_team'],
-        second_innings_score=data['second_innings_score'],
-        second_innings_player_scores=data['second_innings_player_scores'],
-        second_innings_fall_of_wickets=data['second_innings_fall_of_wickets'],
-        second_innings_bowling_data=data['second_innings_bowling_data']
+        all_innings=snapshot.data.innings,
+        stats=snapshot.stats.get(innings_number),
+        stale_since=time.strftime('%H:%M UTC on %d %b', time.gmtime(snapshot.fetched_at)) if stale else None,
+        asset_urls=asset_urls,
+        client_config={
+            'page': page,
+            'pageCount': page_count,
+            'baseUrl': base_url,
+            'inningsNumber': innings_number,
+            'matchId': match_id,
+            'version': innings_version,
+            'pushPort': PUSH_PORT,
+            'pushUrl': PUSH_URL,
+            'staleSince': snapshot.fetched_at if stale else None,
+        },
     )
 
+# Match payload shared by the JSON API and the push channel, a delta when base is given
+def scorecard_body(match_id, snapshot, base=None):
+    body = {
+        'match_id': match_id,
+        'version': snapshot.version,
+        'fetched_at': snapshot.fetched_at,
+        'state': snapshot.data.state,
+        'status': snapshot.data.status,
+    }
+    if base is None:
+        # Unknown or expired base version, the client gets the full card
+        body['delta'] = False
+        body['innings'] = [innings.to_dict() for innings in snapshot.data.innings]
+    else:
+        body['delta'] = True
+        body['since'] = base.version
+        body['innings'] = innings_delta(base.data, snapshot.data)
+    # Derived stats ride along for every innings in the payload
+    body['stats'] = [snapshot.stats[innings['number']].to_dict() for innings in body['innings']
+                     if innings['number'] in snapshot.stats]
+    return body
+
+def find_innings(snapshot, number):
+    for innings in snapshot.data.innings:
+        if innings.number == number:
+            return innings
+    return None
+
+# JSON response with an ETag derived from the snapshot version, the serialised and compressed
+# body is cached under that ETag and purged with the match
+def api_response(match_id, snapshot, build, tag='', tags=None, version=None):
+    etag = f"{match_id}-{version or snapshot.version}{tag}"
+    tags = (match_tag(match_id),) + tuple(tags or (latest_tag(match_id),))
+    # Answer revalidations before building the body, a 304 costs no serialisation
+    if request.if_none_match.contains_weak(etag):
+        response = cache_headers(app.response_class(status=304), etag, tags)
+    else:
+        response = serve_cached(cached_render(('api', etag), lambda: RenderedPage(
+            app.json.dumps(build()), 'application/json', tags, etag)))
+    age = staleness(match_id, snapshot)
+    return mark_stale(response, age) if age is not None else response
+
+def api_snapshot(match_id):
+    if match_id not in scheduler.pollers:
+        return None, (jsonify(error=f"Unknown match {match_id}"), 404)
+    start_background()
+    snapshot = scheduler.current(match_id)
+    if snapshot is None:
+        message = scheduler.pollers[match_id].error or 'Scorecard is loading'
+        return None, (jsonify(error=message), 503, {'Retry-After': str(int(SCRAPE_INTERVAL))})
+    return snapshot, None
+
+# Full match as JSON, or only what changed with ?since=<version>
+@app.route('/api/match/<int:match_id>')
+def api_match(match_id):
+    snapshot, error = api_snapshot(match_id)
+    if error:
+        return error
+    since = request.args.get('since', type=int)
+    base = scheduler.pollers[match_id].snapshot_at(since) if since is not None else None
+
+    return api_response(match_id, snapshot, lambda: scorecard_body(match_id, snapshot, base),
+                        f"-since-{base.version}" if base is not None else '')
+
+@app.route('/api/match/<int:match_id>/innings/<int:number>')
+@app.route('/api/match/<int:match_id>/innings/<int:number>/<any(batting, bowling):table>')
+def api_innings(match_id, number, table=None):
+    snapshot, error = api_snapshot(match_id)
+    if error:
+        return error
+    innings = find_innings(snapshot, number)
+    if innings is None:
+        return jsonify(error=f"Match {match_id} has no innings {number}"), 404
+
+    def build():
+        if table is None:
+            return innings.to_dict()
+        return [row.to_dict() for row in getattr(innings, table)]
+
+    # One innings only changes with its own version, revalidations keep matching until then
+    return api_response(match_id, snapshot, build, f"-{number}-{table or 'all'}",
+                        (innings_tag(match_id, number),), snapshot.innings_versions.get(number))
+
+# Run rates, partnerships, targets and spells for every innings
+@app.route('/api/match/<int:match_id>/stats')
+def api_stats(match_id):
+    snapshot, error = api_snapshot(match_id)
+    if error:
+        return error
+    return api_response(match_id, snapshot,
+                        lambda: [snapshot.stats[number].to_dict() for number in sorted(snapshot.stats)], '-stats')
+
+# Push channel: clients that connect with an older version get the missed changes first
+def push_catch_up(match_id, version):
+    poller = scheduler.pollers.get(match_id)
+    snapshot = poller.snapshot if poller else None
+    if snapshot is None or snapshot.version == version:
+        return None
+    return snapshot.version, scorecard_body(match_id, snapshot, poller.snapshot_at(version))
+
+push_hub = PushHub(PUSH_HOST, PUSH_PORT, catch_up=push_catch_up)
+
+def push_changes(poller, previous, snapshot, diff):
+    if previous is None:
+        return
+    body = scorecard_body(poller.match_id, snapshot, previous)
+    body['events'] = diff.events
+    push_hub.publish(poller.match_id, snapshot.version, body)
+
+scheduler.listeners.append(push_changes)
+
+# Change history, opened with the background workers
+store = None
+_store_lock = threading.Lock()
+
+def persist_changes(poller, previous, snapshot, diff):
+    if store is not None:
+        with STAGE_SECONDS.time(stage='persist'):
+            store.append(poller.match_id, snapshot, diff.events)
+
+scheduler.listeners.append(persist_changes)
+
+# Surrogate-key purge: a change drops the cached responses of the innings that changed and of
+# everything built from the whole match, the next request renders the new version
+def purge_match(match_id, changed_innings, data):
+    tags = [latest_tag(match_id)] + [innings_tag(match_id, number) for number in changed_innings]
+    if data.innings:
+        tags.append(innings_tag(match_id, data.innings[-1].number))
+    render_cache.purge(*tags)
+
+def purge_changes(poller, previous, snapshot, diff):
+    purge_match(poller.match_id, diff.changed_innings, snapshot.data)
+
+scheduler.listeners.append(purge_changes)
+
+# Lets web workers tell an unchanged page from a poller that stopped checking
+def persist_freshness(poller):
+    if store is not None and poller.snapshot is not None:
+        store.touch(poller.match_id, poller.snapshot.fetched_at, poller.error)
+
+scheduler.refresh_listeners.append(persist_freshness)
+
+# Serve the last stored snapshots right away instead of waiting for a cold scrape
+def warm_from_store():
+    for match_id, (version, fetched_at, innings_versions, data) in store.latest(set(scheduler.pollers)).items():
+        poller = scheduler.pollers[match_id]
+        poller.snapshot = Snapshot(data, fetched_at, version, innings_versions, poller.stats.update(data))
+        poller.history.append(poller.snapshot)
+        # Resume the normal schedule from the stored fetch time
+        poller.next_due = fetched_at + poller.interval()
+
+# Web workers don't poll upstream, they install whatever the poller process has stored
+def sync_from_store():
+    heads = store.heads()
+    newer = [match_id for match_id, (version, _, _) in heads.items()
+             if match_id in scheduler.pollers and (scheduler.pollers[match_id].snapshot is None
+                                                   or scheduler.pollers[match_id].snapshot.version < version)]
+    latest = store.latest(newer) if newer else {}
+    for match_id, (_, fetched_at, error) in heads.items():
+        poller = scheduler.pollers.get(match_id)
+        if poller is None:
+            continue
+        if match_id in latest:
+            version, _, innings_versions, data = latest[match_id]
+            previous = poller.snapshot.innings_versions if poller.snapshot else {}
+            poller.snapshot = Snapshot(data, fetched_at, version, innings_versions, poller.stats.update(data))
+            poller.history.append(poller.snapshot)
+            purge_match(match_id, [number for number, innings_version in innings_versions.items()
+                                   if previous.get(number) != innings_version], data)
+        elif poller.snapshot and poller.snapshot.fetched_at < fetched_at:
+            poller.snapshot = poller.snapshot._replace(fetched_at=fetched_at)
+        poller.error = error
+
+def follow_store():
+    while not draining.wait(FOLLOW_INTERVAL):
+        try:
+            sync_from_store()
+        except sqlite3.Error as e:
+            app.logger.warning("Failed to read snapshots from %s: %s", STORE_PATH, e)
+
+# Set once shutdown starts, readiness checks fail from then on
+draining = threading.Event()
+_follower = None
+
+# Background workers start with the first request, importing this module has no side effects
+def start_background():
+    global store, _follower
+    if STORE_PATH and store is None:
+        with _store_lock:
+            if store is None:
+                opened = ScoreStore(STORE_PATH)
+                store = opened
+                if ROLE == 'web':
+                    sync_from_store()
+                else:
+                    warm_from_store()
+    if ROLE == 'web':
+        with _store_lock:
+            if _follower is None and store is not None:
+                _follower = threading.Thread(target=follow_store, name='store-follower', daemon=True)
+                _follower.start()
+        return
+    # The ASGI front end (asgi.py) polls on its own event loop
+    if ROLE != 'asgi':
+        scheduler.start()
+    if PUSH_PORT:
+        push_hub.start()
+
+# Graceful shutdown: fail readiness, let in-flight scrapes finish, then close the store
+def shutdown(timeout=30):
+    draining.set()
+    scheduler.stop(timeout)
+    if parse_pool:
+        parse_pool.close()
+    with _store_lock:
+        if store is not None:
+            store.close()
+
+# ?limit= clamped to 1..maximum, SQLite takes a negative LIMIT as no limit at all
+def limit_arg(default, maximum):
+    return max(1, min(request.args.get('limit', default, type=int), maximum))
+
+# Stored change events for a match, filtered with ?innings=, ?player=, ?type=, ?from= and ?to=
+@app.route('/api/match/<int:match_id>/events')
+def api_events(match_id):
+    if match_id not in scheduler.pollers:
+        return jsonify(error=f"Unknown match {match_id}"), 404
+    start_background()
+    if store is None:
+        return jsonify(error='History store is disabled'), 404
+    events = store.events(
+        match_id=match_id,
+        innings=request.args.get('innings', type=int),
+        player=request.args.get('player'),
+        types=request.args.getlist('type'),
+        start=request.args.get('from', type=float),
+        end=request.args.get('to', type=float),
+        limit=limit_arg(1000, 10000),
+    )
+    return jsonify(match_id=match_id, events=events)
+
+# Stored versions of a match between ?from= and ?to=, oldest first, with the score of each innings
+@app.route('/api/match/<int:match_id>/timeline')
+def api_timeline(match_id):
+    if match_id not in scheduler.pollers:
+        return jsonify(error=f"Unknown match {match_id}"), 404
+    start_background()
+    if store is None:
+        return jsonify(error='History store is disabled'), 404
+    snapshots = store.snapshots(match_id, start=request.args.get('from', type=float),
+                                end=request.args.get('to', type=float), limit=limit_arg(1000, 10000))
+    return jsonify(match_id=match_id, timeline=[{
+        'version': version,
+        'fetched_at': fetched_at,
+        'state': data.state,
+        'status': data.status,
+        'innings': [{'number': innings.number, 'team': innings.team, 'runs': innings.runs,
+                     'wickets': innings.wickets, 'overs': innings.overs} for innings in data.innings],
+    } for version, fetched_at, data in snapshots])
+
+# Columnar copy of every stored scorecard, reloaded per match as new versions are stored
+season = Season()
+
+# Season leaderboards over stored matches, ?board= any of BOARDS, ?match= to restrict, ?limit=
+@app.route('/api/leaderboards')
+def api_leaderboards():
+    start_background()
+    if store is None:
+        return jsonify(error='History store is disabled'), 404
+    boards = request.args.getlist('board') or list(BOARDS)
+    unknown = [board for board in boards if board not in BOARDS]
+    if unknown:
+        return jsonify(error=f"Unknown leaderboard {unknown[0]}, expected one of {', '.join(BOARDS)}"), 400
+    match_ids = set(request.args.getlist('match', type=int)) or None
+    limit = min(request.args.get('limit', 10, type=int), 100)
+    if limit < 1:
+        return jsonify(error='limit must be at least 1'), 400
+    season.refresh(store)
+    return jsonify(matches=season.match_count,
+                   leaderboards={board: season.leaderboard(board, limit, match_ids) for board in boards})
+
+# Gauges read from live state whenever /metrics is scraped
+def snapshot_ages():
+    now = time.time()
+    return {(match_id,): round(now - poller.snapshot.fetched_at, 3)
+            for match_id, poller in scheduler.pollers.items() if poller.snapshot}
+
+def parsed_rows():
+    rows = {}
+    for match_id, poller in scheduler.pollers.items():
+        if poller.snapshot:
+            innings = poller.snapshot.data.innings
+            rows[(match_id, 'batting')] = sum(len(item.batting) for item in innings)
+            rows[(match_id, 'bowling')] = sum(len(item.bowling) for item in innings)
+    return rows
+
+registry.gauge('cricblast_snapshot_age_seconds', 'Seconds since the served snapshot was fetched',
+               ('match',), collect=snapshot_ages)
+registry.gauge('cricblast_parsed_rows', 'Batting and bowling rows in the latest snapshot',
+               ('match', 'table'), collect=parsed_rows)
+registry.gauge('cricblast_render_cache_entries', 'Rendered pages held in memory',
+               collect=lambda: {(): len(render_cache._pages)})
+registry.gauge('cricblast_render_cache_bytes', 'Bytes held by the render cache, compressed variants included',
+               collect=lambda: {(): render_cache.bytes})
+registry.gauge('cricblast_push_subscribers', 'Open live update streams',
+               collect=lambda: {(): push_hub.subscriber_count()})
+registry.gauge('cricblast_parse_queue_depth', 'Pages waiting for or being parsed in the parse pool', ('state',),
+               collect=lambda: {('waiting',): parse_pool.waiting, ('running',): parse_pool.running} if parse_pool else {})
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.teardown_request
+def observe_request(error=None):
+    started = g.pop('request_started', None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or 'unmatched')
+
+# Liveness: the process is up and answering requests
+@app.route('/healthz')
+def healthz():
+    return jsonify(status='ok', role=ROLE)
+
+# Readiness: at least one scorecard can be served and shutdown hasn't started
+@app.route('/readyz')
+def readyz():
+    if draining.is_set():
+        return jsonify(ready=False, role=ROLE, reason='shutting down'), 503
+    start_background()
+    loaded = [match_id for match_id, poller in scheduler.pollers.items() if poller.snapshot is not None]
+    # Degraded matches still serve their last good snapshot, they don't make the instance unready
+    degraded = [match_id for match_id in loaded if staleness(match_id, scheduler.pollers[match_id].snapshot)]
+    ready = len(loaded) > 0
+    return jsonify(ready=ready, role=ROLE, matches=len(scheduler.pollers), loaded=len(loaded), degraded=degraded,
+                   upstream=upstream_breaker.state), 200 if ready else 503
+
+@app.route('/metrics')
+def metrics():
+    return registry.expose(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+# Development server, see serve.py for production
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,290 @@
+# ASGI front end: waiting on the upstream never holds a worker thread
+#
+#   uvicorn asgi:application        (or: python asgi.py --port 5000)
+#
+# Polling runs as asyncio tasks on the server's event loop. Fetches go through httpx when it is
+# installed and through the regular requests client on a thread otherwise. Every refresh is
+# coalesced per match: the poll loop, requests for a stale match and a burst of requests for a
+# cold one all share one in-flight fetch. Parsing and rendering stay in the Flask app and run on
+# a small thread pool once the snapshot a request needs is in memory.
+import argparse
+import asyncio
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+import app
+
+# Polling is driven from here, the Flask app must not start its own scheduler thread
+app.ROLE = 'asgi'
+
+# How long a request for a match with nothing cached waits for the shared fetch (seconds)
+COLD_WAIT = float(os.environ.get('CRICBLAST_COLD_WAIT', 10))
+# Threads for parsing and for running the Flask views
+RENDER_THREADS = int(os.environ.get('CRICBLAST_RENDER_THREADS', 8))
+
+MATCH_PATH_RE = re.compile(r'^/(?:api/)?match/(\d+)(?:/|$)')
+
+executor = ThreadPoolExecutor(max_workers=RENDER_THREADS, thread_name_prefix='asgi')
+
+def match_for_path(path):
+    if path == '/':
+        return app.DEFAULT_MATCH_ID
+    match = MATCH_PATH_RE.match(path)
+    return int(match.group(1)) if match else None
+
+# Event loop counterpart of app.MatchScheduler, driving the same ScorePoller objects
+class AsyncScheduler:
+    def __init__(self, pollers, workers=app.FETCH_WORKERS):
+        self.pollers = pollers
+        self.workers = workers
+        # match id -> running refresh task, the single flight every caller joins
+        self.in_flight = {}
+        self.client = None
+        self._limit = None
+        self._wake = None
+        self._task = None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._limit = asyncio.Semaphore(self.workers)
+        self._wake = asyncio.Event()
+        if httpx is not None:
+            self.client = httpx.AsyncClient(
+                headers=dict(app.session.headers),
+                timeout=httpx.Timeout(app.READ_TIMEOUT, connect=app.CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=self.workers),
+                follow_redirects=True)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, *self.in_flight.values(), return_exceptions=True)
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def _run(self):
+        while True:
+            now = time.time()
+            next_due = now + app.SCRAPE_INTERVAL
+            for poller in self.pollers.values():
+                if poller.match_id in self.in_flight:
+                    continue
+                if poller.next_due <= now:
+                    self.refresh(poller)
+                else:
+                    next_due = min(next_due, poller.next_due)
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.05, next_due - time.time()))
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def refresh(self, poller):
+        task = self.in_flight.get(poller.match_id)
+        if task is None:
+            task = asyncio.create_task(self._refresh(poller))
+            self.in_flight[poller.match_id] = task
+            task.add_done_callback(lambda done: self._finished(poller))
+        return task
+
+    def _finished(self, poller):
+        self.in_flight.pop(poller.match_id, None)
+        self._wake.set()
+
+    async def _refresh(self, poller):
+        async with self._limit:
+            poller.last_attempt = time.time()
+            if poller.held_back():
+                return
+            try:
+                data = await self.scrape(poller.url)
+                # Diffing and the store and push listeners touch disk, keep them off the loop
+                await asyncio.get_running_loop().run_in_executor(executor, self._apply, poller, data)
+            except Exception as e:
+                poller.error = f"Failed to refresh match {poller.match_id}: {e}"
+                poller.next_due = time.time() + poller.interval()
+
+    def _apply(self, poller, data):
+        poller.apply(data)
+        for listener in app.scheduler.refresh_listeners:
+            listener(poller)
+
+    # app.scrape_cricket_data without blocking the loop, only the fetch and the parse call differ
+    async def scrape(self, url):
+        if not app.upstream_breaker.allow():
+            return app.circuit_open_error()
+        start = time.perf_counter()
+        try:
+            with app.STAGE_SECONDS.time(stage='fetch'):
+                html = await self.fetch(url)
+        except requests.exceptions.RequestException as e:
+            return app.fetch_failed(e, start)
+
+        app.fetch_succeeded(html, start)
+        if html is None:
+            return None
+        data = await asyncio.get_running_loop().run_in_executor(executor, app.parse_page, html, url)
+        return app.finish_scrape(data, start)
+
+    async def fetch(self, url):
+        if self.client is None:
+            return await asyncio.get_running_loop().run_in_executor(None, app.fetch_scorecard, url)
+
+        headers = app.conditional_headers(url)
+        for attempt in range(app.FETCH_RETRIES + 1):
+            try:
+                response = await self.get(url, headers)
+                if not app.should_retry(attempt, response.status_code):
+                    break
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if not app.should_retry(attempt):
+                    raise
+            app.UPSTREAM_RETRIES.inc()
+            await asyncio.sleep(app.retry_delay(attempt))
+        return app.accept_response(url, response)
+
+    # The httpx request, its errors raised as the requests exceptions app classifies
+    async def get(self, url, headers):
+        try:
+            return await self.client.get(url, headers=headers)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.exceptions.RequestException(str(e)) from e
+
+    # Make sure a request has something to serve, joining the in-flight refresh if it has nothing
+    async def ensure(self, match_id):
+        poller = self.pollers[match_id]
+        snapshot = poller.snapshot
+        now = time.time()
+        interval = poller.interval()
+        if snapshot is not None and now - snapshot.fetched_at <= interval:
+            return
+        task = self.in_flight.get(match_id)
+        if task is None and now - poller.last_attempt > interval:
+            task = self.refresh(poller)
+        # Stale-while-revalidate: only requests without a servable snapshot wait
+        if task is not None and (snapshot is None or now - snapshot.fetched_at > poller.max_age):
+            try:
+                await asyncio.wait_for(asyncio.shield(task), COLD_WAIT)
+            except asyncio.TimeoutError:
+                pass
+
+scheduler = AsyncScheduler(app.scheduler.pollers)
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0] if client else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = 'HTTP_' + name
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+def call_wsgi(environ):
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+
+    chunks = app.app(environ, start_response)
+    try:
+        body = b''.join(chunks)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+    return response['status'], response['headers'], body
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            app.start_background()
+            await scheduler.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            app.draining.set()
+            await scheduler.stop()
+            app.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+
+    # Servers without lifespan support start polling with the first request
+    await scheduler.start()
+    match_id = match_for_path(scope['path'])
+    if match_id in scheduler.pollers:
+        await scheduler.ensure(match_id)
+
+    status, headers, content = await asyncio.get_running_loop().run_in_executor(
+        executor, call_wsgi, wsgi_environ(scope, body))
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]})
+    await send({'type': 'http.response.body', 'body': content})
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve cricblast as an ASGI app with uvicorn')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit('Serving the ASGI app needs uvicorn: pip install uvicorn, or use any ASGI server with asgi:application')
+    uvicorn.run(application, host=args.host, port=args.port, lifespan='on')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+# Bulk import of past scorecards into the history store
+#
+#   python backfill.py 97200-97260 97301 --rate 1 --store cricblast.db
+#   python backfill.py @match_ids.txt --processes 8
+#
+# Pages are fetched on a few threads under one global rate limit and parsed in a process pool so
+# BeautifulSoup uses every core. Parsed matches are written in batches, each batch together with
+# its checkpoints in one transaction, so an interrupted run picks up where it stopped and never
+# fetches a match it already stored.
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+# The backfill writes to the store itself and never serves pages
+os.environ.setdefault('CRICBLAST_PUSH_PORT', '0')
+
+import requests
+
+import app
+from stats import StatsTracker
+from store import ScoreStore
+
+# Checkpoint statuses, failed matches are retried with --retry-failed
+DONE, MISSING, FAILED = 'done', 'missing', 'failed'
+
+# Spaces requests evenly at `rate` per second across every fetch thread
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    # The upstream asked us to back off (429 with Retry-After), every thread waits
+    def pause(self, seconds):
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+# "97200-97210,97301" and "@file" arguments -> ordered unique match ids
+def parse_ids(specs):
+    ids = []
+    for spec in specs:
+        if spec.startswith('@'):
+            with open(spec[1:]) as f:
+                ids.extend(parse_ids(f.read().split()))
+            continue
+        for part in spec.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            start, _, end = part.partition('-')
+            ids.extend(range(int(start), int(end or start) + 1))
+    return list(dict.fromkeys(ids))
+
+def fetch(url, limiter):
+    for attempt in range(app.FETCH_RETRIES + 1):
+        limiter.acquire()
+        try:
+            response = app.session.get(url, timeout=(app.CONNECT_TIMEOUT, app.READ_TIMEOUT))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == app.FETCH_RETRIES:
+                raise
+        else:
+            if response.status_code not in app.RETRY_STATUSES or attempt == app.FETCH_RETRIES:
+                response.raise_for_status()
+                return response.text
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                limiter.pause(int(retry_after))
+        time.sleep(app.retry_delay(attempt))
+
+# Ctrl-C is handled by the parent, which saves progress before the pool shuts down
+def ignore_interrupts():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def snapshot_for(data, fetched_at):
+    version = int(fetched_at * 1000)
+    return app.Snapshot(data, fetched_at, version, {innings.number: version for innings in data.innings},
+                        StatsTracker().update(data))
+
+class Backfill:
+    def __init__(self, store, limiter, threads, processes, batch_size):
+        self.store = store
+        self.limiter = limiter
+        self.threads = threads
+        self.processes = processes
+        self.batch_size = batch_size
+        self.entries = []
+        self.checkpoints = []
+        self.counts = {DONE: 0, MISSING: 0, FAILED: 0}
+        self._reported = 0
+
+    def flush(self):
+        if self.checkpoints:
+            self.store.append_batch(self.entries, self.checkpoints)
+            self.entries, self.checkpoints = [], []
+
+    def record(self, match_id, status, error=None, snapshot=None):
+        if snapshot is not None:
+            self.entries.append((match_id, snapshot, ()))
+        self.checkpoints.append((match_id, status, error))
+        self.counts[status] += 1
+        if len(self.checkpoints) >= self.batch_size:
+            self.flush()
+
+    def _fetch(self, match_id):
+        return fetch(app.SCORECARD_URL.format(match_id), self.limiter), time.time()
+
+    def run(self, match_ids):
+        started = time.perf_counter()
+        pending = iter(match_ids)
+        fetches, parses = {}, {}
+        # Parse workers are spawned, forking once the fetch threads run can inherit their held locks
+        with ThreadPoolExecutor(self.threads, thread_name_prefix='backfill') as fetch_pool, \
+                ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'),
+                                    initializer=ignore_interrupts) as parse_pool:
+            try:
+                while True:
+                    # Keep every fetch thread busy, but never let fetched pages pile up
+                    # faster than the parse pool drains them
+                    while len(fetches) < self.threads and len(parses) < self.processes * 2:
+                        match_id = next(pending, None)
+                        if match_id is None:
+                            break
+                        fetches[fetch_pool.submit(self._fetch, match_id)] = match_id
+                    if not fetches and not parses:
+                        break
+                    done, _ = wait(list(fetches) + list(parses), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in fetches:
+                            self._fetched(future, fetches.pop(future), parse_pool, parses)
+                        else:
+                            self._parsed(future, *parses.pop(future))
+                    self.progress(len(match_ids), started)
+            finally:
+                # Whatever finished before an interrupt is kept
+                self.flush()
+        self.progress(len(match_ids), started, final=True)
+
+    def _fetched(self, future, match_id, parse_pool, parses):
+        try:
+            html, fetched_at = future.result()
+        except requests.exceptions.HTTPError as e:
+            missing = e.response is not None and e.response.status_code == 404
+            self.record(match_id, MISSING if missing else FAILED, str(e))
+            return
+        except requests.exceptions.RequestException as e:
+            self.record(match_id, FAILED, str(e))
+            return
+        parses[parse_pool.submit(app.parse_packed, html)] = (match_id, fetched_at)
+
+    def _parsed(self, future, match_id, fetched_at):
+        try:
+            data = app.unpack_parsed(future.result())
+        except Exception as e:
+            self.record(match_id, FAILED, f"Parse failed: {e}")
+            return
+        if isinstance(data, dict):
+            self.record(match_id, FAILED, data['error'])
+            return
+        self.record(match_id, DONE, snapshot=snapshot_for(data, fetched_at))
+
+    def progress(self, total, started, final=False):
+        finished = sum(self.counts.values())
+        if not final and finished - self._reported < self.batch_size:
+            return
+        self._reported = finished
+        elapsed = time.perf_counter() - started
+        print(f"{finished}/{total} matches, {self.counts[DONE]} stored, {self.counts[MISSING]} missing, "
+              f"{self.counts[FAILED]} failed, {finished / elapsed if elapsed else 0:.2f}/s", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill past scorecards into the history store')
+    parser.add_argument('ids', nargs='+', help='match ids, ranges like 97200-97260, or @file with one per line')
+    parser.add_argument('--store', default=app.STORE_PATH or 'cricblast.db')
+    parser.add_argument('--rate', type=float, default=1.0, help='upstream requests per second, all threads together')
+    parser.add_argument('--threads', type=int, default=4, help='concurrent fetches')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='parser processes')
+    parser.add_argument('--batch', type=int, default=25, help='matches per store transaction')
+    parser.add_argument('--retry-failed', action='store_true', help='fetch matches that failed in earlier runs again')
+    parser.add_argument('--force', action='store_true', help='ignore checkpoints and fetch everything')
+    args = parser.parse_args()
+
+    store = ScoreStore(args.store)
+    match_ids = parse_ids(args.ids)
+    if not args.force:
+        skip = {DONE, MISSING} if args.retry_failed else {DONE, MISSING, FAILED}
+        checkpoints = store.checkpoints()
+        todo = [match_id for match_id in match_ids if checkpoints.get(match_id, (None,))[0] not in skip]
+        if len(todo) < len(match_ids):
+            print(f"Resuming: {len(match_ids) - len(todo)} of {len(match_ids)} matches already checkpointed",
+                  file=sys.stderr)
+        match_ids = todo
+    if not match_ids:
+        store.close()
+        print('Nothing to backfill', file=sys.stderr)
+        return
+
+    backfill = Backfill(store, RateLimiter(args.rate), args.threads, args.processes, args.batch)
+    try:
+        backfill.run(match_ids)
+    except KeyboardInterrupt:
+        print('Interrupted, progress up to the last finished match is saved', file=sys.stderr)
+        sys.exit(130)
+    finally:
+        store.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,436 @@
+# Benchmarks for the scorecard pipeline over the saved pages in fixtures/
+# Every stage is timed on its own: fetch (against a local stand-in upstream), tree parse,
+# innings extraction, template render for each page and a full request through the test client.
+# The payload stage compares the per-page HTML with the single-payload client-rendered mode.
+# Usage: python bench.py [--repeat N] [--stage STAGE ...] [--json results.json]
+import argparse
+import glob
+import itertools
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+# Benchmarks never touch the history store or open the push port
+os.environ.setdefault('CRICBLAST_STORE', '')
+os.environ.setdefault('CRICBLAST_PUSH_PORT', '0')
+
+import aggregate
+import app
+import models
+import replay
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+STAGES = ('fetch', 'parse', 'extract', 'render', 'request', 'payload', 'aggregate')
+# Scorecards in the synthetic season for the aggregate stage, spread over this many teams
+SEASON_MATCHES = 2000
+SEASON_TEAMS = 38
+# First player link of a section, renamed to make a live-looking change in one innings
+PLAYER_LINK_RE = re.compile(r'(cb-text-link[^>]*>)[^<]+')
+# Network model for the time-to-interactive estimates of the payload stage, a slow mobile link
+MODEL_RTT_MS = 150
+MODEL_KBPS = 1600
+
+def load_fixtures():
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            fixtures[os.path.basename(path)] = f.read()
+    return fixtures
+
+# Run fn repeatedly, returns (best, median) wall time in milliseconds
+def measure(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), statistics.median(timings)
+
+class Results:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.rows = []
+        print(f"{'stage':<8} {'fixture':<24} {'variant':<24} {'best ms':>9} {'median ms':>10}  note")
+
+    def time(self, stage, fixture, variant, fn, note=''):
+        best, median = measure(fn, self.repeat)
+        self.rows.append({'stage': stage, 'fixture': fixture, 'variant': variant, 'best_ms': round(best, 4),
+                          'median_ms': round(median, 4), 'repeat': self.repeat, 'note': note})
+        print(f"{stage:<8} {fixture:<24} {variant:<24} {best:9.3f} {median:10.3f}  {note}")
+
+# The original two-innings extraction loops, kept as the baseline for extract_innings()
+def legacy_extract(soup):
+    def get_text_or_none(element, selector=None):
+        if element is None:
+            return "N/A"
+        if selector:
+            el = element.find(selector)
+        else:
+            el = element
+        return el.text.strip() if el else "N/A"
+
+    # First innings: Batting and Bowling
+    innings_data = soup.find_all('div', class_='cb-col cb-col-100 cb-ltst-wgt-hdr')
+
+    if len(innings_data) < 2:
+        return {'error': 'Incomplete innings data'}
+
+    first_innings_batting = innings_data[0]  # Batting
+    first_innings_bowling = innings_data[1]  # Bowling
+
+    # Second innings: Batting and Bowling (if available)
+    second_innings = soup.find('div', id='innings_2')
+
+    if second_innings:
+        second_innings_batting = second_innings.find('div', class_='cb-col cb-col-100 cb-ltst-wgt-hdr')
+        second_innings_bowling = second_innings.find_all('div', class_='cb-col cb-col-100 cb-ltst-wgt-hdr')[1]
+    else:
+        second_innings_batting, second_innings_bowling = None, None
+
+    # Extract team names and scores
+    first_innings_team = get_text_or_none(first_innings_batting.find('span'))
+    first_innings_score = get_text_or_none(first_innings_batting.find('span', class_='pull-right'))
+
+    second_innings_team = get_text_or_none(second_innings_batting.find('span')) if second_innings_batting else "N/A"
+    second_innings_score = get_text_or_none(second_innings_batting.find('span', class_='pull-right')) if second_innings_batting else "N/A"
+
+    # Extract player scores for first innings
+    first_innings_player_scores = []
+    players = first_innings_batting.find_all('div', class_='cb-col cb-col-100 cb-scrd-itms')
+    for player in players:
+        player_columns = player.find_all('div', class_='cb-col')
+        if len(player_columns) < 7:
+            continue
+        first_innings_player_scores.append({
+            'name': get_text_or_none(player.find('a', class_='cb-text-link')),
+            'dismissal': get_text_or_none(player.find('span', class_='text-gray')),
+            'runs': get_text_or_none(player_columns[2]),
+            'balls': get_text_or_none(player_columns[3]),
+            'fours': get_text_or_none(player_columns[4]),
+            'sixes': get_text_or_none(player_columns[5]),
+            'strike_rate': get_text_or_none(player_columns[6])
+        })
+
+    # Extract bowling data for first innings
+    first_innings_bowling_data = []
+    bowlers = first_innings_bowling.find_all('div', class_='cb-col cb-col-100 cb-scrd-itms')
+    for bowler in bowlers:
+        bowler_columns = bowler.find_all('div', class_='cb-col')
+        if len(bowler_columns) < 8:
+            continue
+        first_innings_bowling_data.append({
+            'name': get_text_or_none(bowler.find('a', class_='cb-text-link')),
+            'overs': get_text_or_none(bowler_columns[1]),
+            'maidens': get_text_or_none(bowler_columns[2]),
+            'runs': get_text_or_none(bowler_columns[3]),
+            'wickets': get_text_or_none(bowler_columns[4]),
+            'nb': get_text_or_none(bowler_columns[5]),
+            'wd': get_text_or_none(bowler_columns[6]),
+            'eco': get_text_or_none(bowler_columns[7])
+        })
+
+    # Extract player scores for second innings
+    second_innings_player_scores = []
+    if second_innings_batting:
+        second_innings_players = second_innings_batting.find_all('div', class_='cb-col cb-col-100 cb-scrd-itms')
+        for player in second_innings_players:
+            player_columns = player.find_all('div', class_='cb-col')
+            if len(player_columns) < 7:
+                continue
+            second_innings_player_scores.append({
+                'name': get_text_or_none(player.find('a', class_='cb-text-link')),
+                'dismissal': get_text_or_none(player.find('span', class_='text-gray')),
+                'runs': get_text_or_none(player_columns[2]),
+                'balls': get_text_or_none(player_columns[3]),
+                'fours': get_text_or_none(player_columns[4]),
+                'sixes': get_text_or_none(player_columns[5]),
+                'strike_rate': get_text_or_none(player_columns[6])
+            })
+
+    # Extract bowling data for second innings
+    second_innings_bowling_data = []
+    if second_innings_bowling:
+        second_innings_bowlers = second_innings_bowling.find_all('div', class_='cb-col cb-col-100 cb-scrd-itms')
+        for bowler in second_innings_bowlers:
+            bowler_columns = bowler.find_all('div', class_='cb-col')
+            if len(bowler_columns) < 8:
+                continue
+            second_innings_bowling_data.append({
+                'name': get_text_or_none(bowler.find('a', class_='cb-text-link')),
+                'overs': get_text_or_none(bowler_columns[1]),
+                'maidens': get_text_or_none(bowler_columns[2]),
+                'runs': get_text_or_none(bowler_columns[3]),
+                'wickets': get_text_or_none(bowler_columns[4]),
+                'nb': get_text_or_none(bowler_columns[5]),
+                'wd': get_text_or_none(bowler_columns[6]),
+                'eco': get_text_or_none(bowler_columns[7])
+            })
+
+    # Extract fall of wickets for both innings
+    first_innings_fall_of_wickets = get_text_or_none(soup.find('div', class_='cb-col cb-col-100 cb-col-rt cb-font-13'))
+    second_innings_fall_of_wickets = get_text_or_none(second_innings.find('div', class_='cb-col cb-col-100 cb-col-rt cb-font-13')) if second_innings else "N/A"
+
+    return {
+        'first_innings_team': first_innings_team,
+        'first_innings_score': first_innings_score,
+        'first_innings_player_scores': first_innings_player_scores,
+        'first_innings_fall_of_wickets': first_innings_fall_of_wickets,
+        'first_innings_bowling_data': first_innings_bowling_data,
+        'second_innings_team': second_innings_team,
+        'second_innings_score': second_innings_score,
+        'second_innings_player_scores': second_innings_player_scores,
+        'second_innings_fall_of_wickets': second_innings_fall_of_wickets,
+        'second_innings_bowling_data': second_innings_bowling_data
+    }
+
+# Serves the fixtures as /live-cricket-scorecard/<n> like the real upstream
+class FixtureSource:
+    def __init__(self, fixtures):
+        self.pages = {str(index): html.encode('utf-8') for index, html in enumerate(fixtures.values())}
+
+    def page(self, match_id):
+        return self.pages.get(match_id)
+
+def bench_fetch(fixtures, results):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), replay.make_handler(FixtureSource(fixtures)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for index, fixture in enumerate(fixtures):
+            url = f"http://127.0.0.1:{server.server_port}/live-cricket-scorecard/{index}"
+
+            def download():
+                app.validators.pop(url, None)
+                app.fetch_scorecard(url)
+
+            results.time('fetch', fixture, 'pooled download', download)
+            # Validators are primed by the download above, so this is a 304 round trip
+            results.time('fetch', fixture, 'conditional (304)', lambda: app.fetch_scorecard(url))
+    finally:
+        server.shutdown()
+
+def bench_parse(fixtures, results):
+    for fixture, html in fixtures.items():
+        # The full html.parser tree is the reference every backend must match
+        reference = app.parse_scorecard(html, 'html.parser')
+        for name, parse in app.PARSERS.items():
+            same = app.parse_scorecard(html, name) == reference
+            results.time('parse', fixture, name, lambda: parse(html), 'identical' if same else 'MISMATCH')
+
+    # Round trip through a parse worker, including the packed snapshot coming back
+    pool = app.ParsePool(1, 1)
+    try:
+        for fixture, html in fixtures.items():
+            pool.parse(html)
+            same = pool.parse(html) == app.parse_scorecard(html)
+            results.time('parse', fixture, 'process pool', lambda: pool.parse(html), 'identical' if same else 'MISMATCH')
+            payload = app.parse_packed(html)
+            results.time('parse', fixture, 'unpack in parent', lambda: app.unpack_parsed(payload),
+                         f"{len(payload)} bytes")
+    finally:
+        pool.close()
+
+    # Per-poll cost of a live match: consecutive pages differ in the last innings only, the
+    # incremental parse fingerprints every section and re-parses just that one
+    for fixture, html in fixtures.items():
+        sections = app.innings_sections(html)
+        last = sections[-1][1]
+        pages = [html, html.replace(last, PLAYER_LINK_RE.sub(r'\1Substitute', last, count=1))]
+        url = f"fixture:{fixture}"
+        polls = itertools.cycle(pages)
+        results.time('parse', fixture, 'full page', lambda: app.parse_scorecard(next(polls)))
+        app.innings_cache.pop(url, None)
+        same = all(app.parse_page(page, url) == app.parse_scorecard(page) for page in pages * 2)
+        note = f"{len(sections) - 1} of {len(sections)} innings reused, {'identical' if same else 'MISMATCH'}"
+        polls = itertools.cycle(pages)
+        results.time('parse', fixture, 'incremental, live', lambda: app.parse_page(next(polls), url), note)
+        app.parse_page(html, url)
+        results.time('parse', fixture, 'incremental, unchanged', lambda: app.parse_page(html, url),
+                     f"{len(sections)} of {len(sections)} innings reused")
+
+def bench_extract(fixtures, results):
+    for fixture, html in fixtures.items():
+        soup = app.parse_full(html)
+        legacy = legacy_extract(soup)
+        # The legacy loops only ever see the first two innings
+        legacy_count = sum(1 for key in ('first_innings_team', 'second_innings_team') if legacy[key] != "N/A")
+        results.time('extract', fixture, 'legacy', lambda: legacy_extract(soup), f"{legacy_count} innings")
+        results.time('extract', fixture, 'generic', lambda: app.extract_innings(soup),
+                     f"{len(app.extract_innings(soup))} innings")
+
+def fixture_snapshots(fixtures):
+    snapshots = {}
+    for index, (fixture, html) in enumerate(fixtures.items()):
+        data = app.parse_scorecard(html)
+        version = int(time.time() * 1000)
+        snapshots[fixture] = (900000 + index, app.Snapshot(data, time.time(), version,
+                                                           {innings.number: version for innings in data.innings},
+                                                           app.StatsTracker().update(data)))
+    return snapshots
+
+def bench_render(fixtures, results):
+    for fixture, (match_id, snapshot) in fixture_snapshots(fixtures).items():
+        for page in range(1, 2 * len(snapshot.data.innings) + 1):
+            results.time('render', fixture, f"template page {page}",
+                         lambda: app.render_html(match_id, snapshot, page, f"/match/{match_id}"))
+        html = app.render_html(match_id, snapshot, 1, f"/match/{match_id}")
+        results.time('render', fixture, 'compress page 1', lambda: app.RenderedPage(html),
+                     'gzip + brotli' if app.brotli else 'gzip')
+
+def bench_request(fixtures, results):
+    # Publish the fixtures as matches and keep the scheduler from ever fetching upstream
+    snapshots = fixture_snapshots(fixtures)
+    for match_id, snapshot in snapshots.values():
+        poller = app.ScorePoller(match_id, f"fixture:{match_id}")
+        poller.snapshot = snapshot
+        app.scheduler.pollers[match_id] = poller
+    for poller in app.scheduler.pollers.values():
+        poller.next_due = float('inf')
+
+    client = app.app.test_client()
+    for fixture, (match_id, _) in snapshots.items():
+        url = f"/match/{match_id}?page=1"
+
+        def cold():
+            app.render_cache.clear()
+            client.get(url)
+
+        results.time('request', fixture, 'page 1 cold render', cold)
+        client.get(url)
+        results.time('request', fixture, 'page 1 cached', lambda: client.get(url))
+        results.time('request', fixture, 'page 1 cached gzip', lambda: client.get(url, headers={'Accept-Encoding': 'gzip'}))
+        etag = client.get(url).headers['ETag']
+        results.time('request', fixture, 'page 1 not modified', lambda: client.get(url, headers={'If-None-Match': etag}))
+        results.time('request', fixture, 'api match', lambda: client.get(f"/api/match/{match_id}"))
+
+def compressed_size(rendered):
+    return len(rendered.brotli or rendered.gzip)
+
+# Round trips plus transfer time on the modelled link
+def transfer_ms(size, round_trips=1):
+    return round_trips * MODEL_RTT_MS + size * 8 / MODEL_KBPS
+
+def bench_payload(fixtures, results):
+    encoding = 'brotli' if app.brotli else 'gzip'
+    assets = {}
+    for name in ('scorecard.css', 'scorecard.js', 'match_app.js'):
+        with open(os.path.join(app.app.static_folder, name), encoding='utf-8') as f:
+            assets[name] = compressed_size(app.RenderedPage(f.read()))
+
+    for fixture, (match_id, snapshot) in fixture_snapshots(fixtures).items():
+        pages = range(1, 2 * len(snapshot.data.innings) + 1)
+        base_url = f"/match/{match_id}"
+
+        def per_page():
+            return [app.RenderedPage(app.render_html(match_id, snapshot, page, base_url)) for page in pages]
+
+        def single():
+            return app.RenderedPage(app.render_app(match_id, snapshot, f"{base_url}/app"))
+
+        # First visit: the document, then its stylesheet and script in parallel; every later
+        # page is another document round trip in HTML mode and nothing at all in payload mode
+        sizes = [compressed_size(rendered) for rendered in per_page()]
+        first = transfer_ms(sizes[0]) + transfer_ms(assets['scorecard.css'] + assets['scorecard.js'])
+        every = first + sum(transfer_ms(size) for size in sizes[1:])
+        results.time('payload', fixture, f"html, {len(sizes)} pages", per_page,
+                     f"{sum(sizes)} bytes {encoding}, ~{first:.0f} ms to page 1, ~{every:.0f} ms to all pages")
+        size = compressed_size(single())
+        first = transfer_ms(size) + transfer_ms(assets['scorecard.css'] + assets['match_app.js'])
+        results.time('payload', fixture, 'single payload', single,
+                     f"{size} bytes {encoding}, ~{first:.0f} ms to page 1, ~{first:.0f} ms to all pages")
+        def packed():
+            return json.dumps(app.packed_match(match_id, snapshot), separators=(',', ':'))
+
+        plain = json.dumps(app.scorecard_body(match_id, snapshot), separators=(',', ':'))
+        results.time('payload', fixture, 'packed json', packed,
+                     f"{len(packed())} bytes vs {len(plain)} bytes as row objects")
+
+# A season of fixture scorecards with renamed teams, so players and teams spread out like a real one
+def synthetic_matches(fixtures, size):
+    cards = [app.parse_scorecard(html).to_dict() for html in fixtures.values()]
+    matches = []
+    for match_id in range(size):
+        card = json.dumps(cards[match_id % len(cards)])
+        for slot, team in enumerate(sorted({innings['team'] for innings in cards[match_id % len(cards)]['innings']})):
+            renamed = f"Team{(match_id + slot * 7) % SEASON_TEAMS}"
+            card = card.replace(team, renamed).replace(team[:3], renamed)
+        matches.append(models.Match.from_dict(json.loads(card)))
+    return matches
+
+def season_of(matches):
+    season = aggregate.Season()
+    for match_id, match in enumerate(matches):
+        season.add(match_id, 1, match)
+    return season
+
+def bench_aggregate(fixtures, results):
+    backend = 'numpy' if aggregate.numpy is not None else 'array'
+    matches = synthetic_matches(fixtures, SEASON_MATCHES)
+    label = f"{SEASON_MATCHES} matches"
+    results.time('aggregate', label, f"add all ({backend})", lambda: season_of(matches))
+    season = season_of(matches)
+    rows = f"{season.batting.size} batting, {season.bowling.size} bowling rows"
+    results.time('aggregate', label, 'compact columns', season.build, rows)
+
+    def cold():
+        # First query after startup, group sums included
+        season._totals.clear()
+        return [season.leaderboard(board, 10) for board in aggregate.BOARDS]
+
+    results.time('aggregate', label, 'all boards, cold', cold)
+    for board in aggregate.BOARDS:
+        results.time('aggregate', label, board, lambda: season.leaderboard(board, 10))
+    some = set(range(0, SEASON_MATCHES, 10))
+    results.time('aggregate', label, 'runs, 10% of matches', lambda: season.leaderboard('runs', 10, some))
+
+    # A live poll: one match's scorecard moved on, its rows and the season sums are replaced in place
+    versions = itertools.count(2)
+    live = len(matches) // 2
+    results.time('aggregate', label, 'update 1 match', lambda: season.add(live, next(versions), matches[live]),
+                 'rows and warm sums')
+    results.time('aggregate', label, 'update 1 match, boards',
+                 lambda: (season.add(live, next(versions), matches[live]),
+                          [season.leaderboard(board, 10) for board in aggregate.BOARDS]))
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scorecard pipeline stage by stage')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--stage', action='append', choices=STAGES, help='run only these stages')
+    parser.add_argument('--json', metavar='PATH', help='also write machine-readable results here')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    results = Results(args.repeat)
+    stages = args.stage or STAGES
+    for stage in STAGES:
+        if stage in stages:
+            globals()[f"bench_{stage}"](fixtures, results)
+
+    if args.json:
+        report = {
+            'created_at': time.time(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'tree_builder': app.FAST_TREE_BUILDER,
+            'brotli': app.brotli is not None,
+            'fixtures': {name: len(html) for name, html in fixtures.items()},
+            'results': results.rows,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# Circuit breakers around the upstream
+# Closed, every call goes through and consecutive failures are counted. At `threshold` failures
+# the circuit opens and calls are refused without touching the upstream until the cooldown has
+# passed, then it is half-open and lets a single probe through. A good probe closes the circuit,
+# a bad one opens it again with twice the cooldown, up to `max_cooldown`.
+import threading
+import time
+
+from metrics import registry
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_STATE = registry.gauge('cricblast_circuit_state', 'Circuit state: 0 closed, 1 half-open, 2 open', ('circuit',))
+CIRCUIT_FAILURES = registry.gauge('cricblast_circuit_failures', 'Consecutive failures seen by a circuit', ('circuit',))
+CIRCUIT_TRANSITIONS = registry.counter('cricblast_circuit_transitions_total', 'Circuit state changes',
+                                       ('circuit', 'state'))
+CIRCUIT_REJECTED = registry.counter('cricblast_circuit_rejected_total', 'Calls refused by an open circuit',
+                                    ('circuit',))
+
+class CircuitBreaker:
+    def __init__(self, name, threshold, cooldown, max_cooldown=None):
+        self.name = name
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown or cooldown
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.last_error = None
+        self.retry_at = 0.0
+        self._probe_started = None
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(STATE_VALUES[CLOSED], circuit=name)
+        CIRCUIT_FAILURES.set(0, circuit=name)
+
+    def _set(self, state):
+        self.state = state
+        CIRCUIT_STATE.set(STATE_VALUES[state], circuit=self.name)
+        CIRCUIT_TRANSITIONS.inc(circuit=self.name, state=state)
+
+    # May the caller go ahead? In half-open state only the caller that gets True is the probe
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN and now >= self.retry_at:
+                self._set(HALF_OPEN)
+                self._probe_started = None
+            # A probe that never reported back (cancelled, crashed) doesn't hold the circuit forever
+            if self.state == HALF_OPEN and (self._probe_started is None
+                                            or now - self._probe_started > self.cooldown):
+                self._probe_started = now
+                return True
+        CIRCUIT_REJECTED.inc(circuit=self.name)
+        return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.last_error = None
+            self.cooldown = self.base_cooldown
+            CIRCUIT_FAILURES.set(0, circuit=self.name)
+            if self.state != CLOSED:
+                self._set(CLOSED)
+
+    def failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            CIRCUIT_FAILURES.set(self.failures, circuit=self.name)
+            if self.state == HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            elif self.state == OPEN or self.failures < self.threshold:
+                return
+            self.retry_at = time.monotonic() + self.cooldown
+            self._set(OPEN)
+
+    # Seconds until an open circuit lets a probe through
+    def retry_in(self):
+        return max(self.retry_at - time.monotonic(), 0.0) if self.state == OPEN else 0.0
@@ -0,0 +1,87 @@
+# Change detection between successive scorecard snapshots of one match
+from collections import namedtuple
+
+# events: list of dicts ready for JSON, changed_innings: numbers of innings that differ
+Diff = namedtuple('Diff', ['events', 'changed_innings'])
+
+def changed_rows(old_rows, new_rows):
+    # Rows that are new or changed between two versions of a table, keyed by player name
+    previous = {row.name: row for row in old_rows}
+    return [row for row in new_rows if previous.get(row.name) != row]
+
+def innings_delta(old, new):
+    # Only the parts of each innings that changed since an older snapshot
+    old_innings = {innings.number: innings for innings in old.innings}
+    delta = []
+    for innings in new.innings:
+        before = old_innings.get(innings.number)
+        if before is None:
+            delta.append(innings.to_dict())
+            continue
+        if before == innings:
+            continue
+        entry = {name: getattr(innings, name) for name in ('number', 'team', 'score', 'runs', 'wickets', 'balls')}
+        entry['batting'] = [row.to_dict() for row in changed_rows(before.batting, innings.batting)]
+        entry['bowling'] = [row.to_dict() for row in changed_rows(before.bowling, innings.bowling)]
+        entry['fall_of_wickets'] = [fall.to_dict() for fall in innings.fall_of_wickets[len(before.fall_of_wickets):]]
+        delta.append(entry)
+    return delta
+
+def increase(after, before):
+    return (after or 0) - (before or 0)
+
+# One differ per match, it remembers who was bowling to spot bowling changes
+class ScorecardDiffer:
+    def __init__(self):
+        self.current_bowler = {}
+
+    def diff(self, old, new):
+        events = []
+        changed = []
+        if old.state != new.state or old.status != new.status:
+            events.append({'type': 'status_changed', 'state': new.state, 'status': new.status})
+        old_innings = {innings.number: innings for innings in old.innings}
+        for innings in new.innings:
+            before = old_innings.get(innings.number)
+            # Completed innings compare equal and cost a single tuple comparison
+            if before == innings:
+                continue
+            changed.append(innings.number)
+            if before is None:
+                events.append({'type': 'innings_started', 'innings': innings.number, 'team': innings.team})
+                before = type(innings)(innings.number, innings.team, None, 0, 0, 0, (), (), ())
+            self._diff_innings(before, innings, events)
+        return Diff(events, changed)
+
+    def _diff_innings(self, before, after, events):
+        number = after.number
+        if after.runs != before.runs or after.wickets != before.wickets:
+            events.append({'type': 'score_changed', 'innings': number, 'score': after.score,
+                           'runs_added': increase(after.runs, before.runs)})
+
+        for row in changed_rows(before.batting, after.batting):
+            previous = next((old for old in before.batting if old.name == row.name), None)
+            runs = increase(row.runs, previous.runs if previous else None)
+            balls = increase(row.balls, previous.balls if previous else None)
+            if runs or balls:
+                events.append({'type': 'runs_added', 'innings': number, 'player': row.name,
+                               'runs': runs, 'balls': balls, 'total': row.runs})
+
+        for fall in after.fall_of_wickets[len(before.fall_of_wickets):]:
+            events.append({'type': 'wicket', 'innings': number, 'player': fall.batsman,
+                           'wicket': fall.wicket, 'score': fall.score, 'overs': fall.overs})
+
+        if after.balls is not None and (before.balls or 0) // 6 < after.balls // 6:
+            for over in range((before.balls or 0) // 6 + 1, after.balls // 6 + 1):
+                events.append({'type': 'over_completed', 'innings': number, 'over': over})
+
+        for row in changed_rows(before.bowling, after.bowling):
+            previous = next((old for old in before.bowling if old.name == row.name), None)
+            if increase(row.balls, previous.balls if previous else None) <= 0:
+                continue
+            current = self.current_bowler.get(number)
+            if current != row.name:
+                if current is not None:
+                    events.append({'type': 'bowler_changed', 'innings': number,
+                                   'bowler': row.name, 'previous': current})
+                self.current_bowler[number] = row.name
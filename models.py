@@ -0,0 +1,179 @@
+# Typed scorecard model, numeric fields are parsed once at scrape time
+import re
+
+SCORE_RE = re.compile(r'(\d+)(?:-(\d+))?')
+OVERS_RE = re.compile(r'\(\s*(\d+(?:\.\d)?)\s*Ov')
+FALL_OF_WICKET_RE = re.compile(r'(\d+)-(\d+)\s*\(\s*(.*?),\s*(\d+(?:\.\d)?)\s*(?:ov)?\s*\)')
+
+# Scraped cells use "N/A" for anything missing
+def to_text(text):
+    return None if text in (None, 'N/A') else text
+
+def to_int(text):
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return None
+
+def to_float(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+# "70.3" overs -> 423 balls
+def overs_to_balls(text):
+    if text is None:
+        return None
+    whole, _, part = str(text).partition('.')
+    if not whole.isdigit() or (part and not part.isdigit()):
+        return None
+    return int(whole) * 6 + (int(part) if part else 0)
+
+def balls_to_overs(balls):
+    if balls is None:
+        return None
+    return f"{balls // 6}.{balls % 6}" if balls % 6 else str(balls // 6)
+
+# Base class for the slotted records: equality, repr and plain-dict export
+class Record:
+    __slots__ = ()
+    # Fields holding tuples of other records, used to rebuild them from plain dicts
+    nested = {}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def to_dict(self):
+        result = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, tuple):
+                value = [item.to_dict() if isinstance(item, Record) else item for item in value]
+            result[name] = value
+        return result
+
+    @classmethod
+    def from_dict(cls, values):
+        fields = {}
+        for name in cls.__slots__:
+            value = values.get(name)
+            if name in cls.nested:
+                value = tuple(cls.nested[name].from_dict(item) for item in value or ())
+            fields[name] = value
+        return cls(**fields)
+
+class BattingRow(Record):
+    __slots__ = ('name', 'dismissal', 'runs', 'balls', 'fours', 'sixes', 'strike_rate')
+
+    def __init__(self, name, dismissal, runs, balls, fours, sixes, strike_rate):
+        self.name = name
+        self.dismissal = dismissal
+        self.runs = runs
+        self.balls = balls
+        self.fours = fours
+        self.sixes = sixes
+        self.strike_rate = strike_rate
+
+    @classmethod
+    def from_text(cls, name, dismissal, runs, balls, fours, sixes, strike_rate):
+        return cls(to_text(name), to_text(dismissal), to_int(runs), to_int(balls), to_int(fours), to_int(sixes),
+                   to_float(strike_rate))
+
+    @property
+    def not_out(self):
+        return self.dismissal in ('not out', 'batting')
+
+class BowlingRow(Record):
+    # Overs are stored as balls bowled so they can be summed and compared
+    __slots__ = ('name', 'balls', 'maidens', 'runs', 'wickets', 'nb', 'wd', 'economy')
+
+    def __init__(self, name, balls, maidens, runs, wickets, nb, wd, economy):
+        self.name = name
+        self.balls = balls
+        self.maidens = maidens
+        self.runs = runs
+        self.wickets = wickets
+        self.nb = nb
+        self.wd = wd
+        self.economy = economy
+
+    @classmethod
+    def from_text(cls, name, overs, maidens, runs, wickets, nb, wd, eco):
+        return cls(to_text(name), overs_to_balls(overs), to_int(maidens), to_int(runs), to_int(wickets),
+                   to_int(nb), to_int(wd), to_float(eco))
+
+    @property
+    def overs(self):
+        return balls_to_overs(self.balls)
+
+class FallOfWicket(Record):
+    __slots__ = ('wicket', 'score', 'balls', 'batsman')
+
+    def __init__(self, wicket, score, balls, batsman):
+        self.wicket = wicket
+        self.score = score
+        self.balls = balls
+        self.batsman = batsman
+
+    @property
+    def overs(self):
+        return balls_to_overs(self.balls)
+
+# "1-12 (Tanmay Agarwal, 3.4), 2-40 (Rohit Rayudu, 10.1)" -> FallOfWicket entries
+def parse_fall_of_wickets(text):
+    if not to_text(text):
+        return ()
+    return tuple(FallOfWicket(int(wicket), int(score), overs_to_balls(overs), batsman.strip())
+                 for wicket, score, batsman, overs in FALL_OF_WICKET_RE.findall(text))
+
+class Innings(Record):
+    __slots__ = ('number', 'team', 'score', 'runs', 'wickets', 'balls', 'batting', 'bowling',
+                 'fall_of_wickets')
+    nested = {'batting': BattingRow, 'bowling': BowlingRow, 'fall_of_wickets': FallOfWicket}
+
+    def __init__(self, number, team, score, runs, wickets, balls, batting, bowling, fall_of_wickets):
+        self.number = number
+        self.team = team
+        self.score = score
+        self.runs = runs
+        self.wickets = wickets
+        self.balls = balls
+        self.batting = tuple(batting)
+        self.bowling = tuple(bowling)
+        self.fall_of_wickets = tuple(fall_of_wickets)
+
+    @classmethod
+    def from_text(cls, number, team, score, batting, bowling, fall_of_wickets):
+        # "Hyderabad Innings" -> "Hyderabad", "224-10 (70.3 Ov)" -> 224, 10, 423
+        team, score = to_text(team), to_text(score)
+        total = SCORE_RE.match(score or '')
+        overs = OVERS_RE.search(score or '')
+        return cls(number, (team or '').replace('Innings', '').strip() or None, score,
+                   int(total.group(1)) if total else None,
+                   int(total.group(2)) if total and total.group(2) else (0 if total else None),
+                   overs_to_balls(overs.group(1)) if overs else None,
+                   batting, bowling, parse_fall_of_wickets(fall_of_wickets))
+
+    @property
+    def overs(self):
+        return balls_to_overs(self.balls)
+
+class Match(Record):
+    __slots__ = ('state', 'status', 'innings')
+    nested = {'innings': Innings}
+
+    def __init__(self, state, status, innings):
+        self.state = state
+        self.status = status
+        self.innings = tuple(innings)
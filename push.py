@@ -0,0 +1,143 @@
+# Server-Sent Events fan-out for live score changes
+# One asyncio loop on one thread serves every subscriber, an idle client costs a socket and a
+# coroutine instead of a Flask worker thread.
+import asyncio
+import json
+import logging
+import re
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+log = logging.getLogger(__name__)
+
+EVENTS_PATH_RE = re.compile(r'^/events/(\d+)$')
+# Clients whose unsent backlog grows past this are dropped, they reconnect with Last-Event-ID
+MAX_BUFFERED_BYTES = 256 * 1024
+HEARTBEAT_INTERVAL = 15
+
+class PushHub:
+    def __init__(self, host, port, catch_up=None):
+        self.host = host
+        self.port = port
+        # catch_up(match_id, version) -> (version, payload) for clients that missed events
+        self.catch_up = catch_up
+        self.subscribers = {}
+        # Only the loop thread changes subscribers, other threads read this count instead of walking them
+        self.subscriber_total = 0
+        self.loop = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='push-hub', daemon=True)
+            self._thread.start()
+        self._ready.wait(5)
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port,
+                                                         reuse_address=True))
+        except OSError as e:
+            # Another worker already owns the port, pages still work without live updates
+            log.warning("push channel disabled, cannot listen on %s:%s: %s", self.host, self.port, e)
+            self._ready.set()
+            return
+        loop.create_task(self._heartbeat())
+        self.loop = loop
+        self._ready.set()
+        loop.run_forever()
+
+    def subscriber_count(self):
+        return self.subscriber_total
+
+    # Thread-safe, called by the scrape pipeline when a match changes
+    def publish(self, match_id, version, data):
+        if self.loop is None:
+            return
+        message = format_event('scorecard', version, data)
+        self.loop.call_soon_threadsafe(self._fan_out, match_id, message)
+
+    def _fan_out(self, match_id, message):
+        for writer in list(self.subscribers.get(match_id, ())):
+            self._send(match_id, writer, message)
+
+    def _send(self, match_id, writer, message):
+        if writer.transport.is_closing() or writer.transport.get_write_buffer_size() > MAX_BUFFERED_BYTES:
+            self._unsubscribe(match_id, writer)
+            writer.close()
+            return
+        writer.write(message)
+
+    def _unsubscribe(self, match_id, writer):
+        writers = self.subscribers.get(match_id)
+        if writers is not None and writer in writers:
+            writers.discard(writer)
+            self.subscriber_total -= 1
+            if not writers:
+                del self.subscribers[match_id]
+
+    async def _heartbeat(self):
+        # SSE comments keep proxies from closing idle streams
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            for match_id, writers in list(self.subscribers.items()):
+                for writer in list(writers):
+                    self._send(match_id, writer, b': ping\n\n')
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            writer.close()
+            return
+
+        parts = request_line.decode('latin-1').split()
+        url = urlsplit(parts[1]) if len(parts) >= 2 else None
+        match = EVENTS_PATH_RE.match(url.path) if url else None
+        if parts[:1] != ['GET'] or match is None:
+            writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            writer.close()
+            return
+
+        match_id = int(match.group(1))
+        writer.write(b'HTTP/1.1 200 OK\r\n'
+                     b'Content-Type: text/event-stream\r\n'
+                     b'Cache-Control: no-cache\r\n'
+                     b'Access-Control-Allow-Origin: *\r\n'
+                     b'Connection: keep-alive\r\n\r\n'
+                     b'retry: 3000\n\n')
+
+        # Reconnecting clients (or a freshly rendered page) say which version they already have
+        since = headers.get('last-event-id') or parse_qs(url.query).get('since', [None])[0]
+        if since and since.isdigit() and self.catch_up:
+            missed = self.catch_up(match_id, int(since))
+            if missed is not None:
+                writer.write(format_event('scorecard', *missed))
+
+        self.subscribers.setdefault(match_id, set()).add(writer)
+        self.subscriber_total += 1
+        try:
+            # Nothing is expected from the client, EOF means it went away
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self._unsubscribe(match_id, writer)
+            writer.close()
+
+def format_event(event, version, data):
+    return f"event: {event}\nid: {version}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
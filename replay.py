@@ -0,0 +1,185 @@
+# Record and replay of raw upstream scorecard pages, for load testing without cricbuzz.com
+#
+# Record: run the app with CRICBLAST_RECORD_DIR=recordings, every page fetched from upstream is
+#         saved as recordings/<match id>/<unix ms>.html.gz
+# Serve:  python replay.py serve recordings --speed 10
+#         then run the app with CRICBLAST_UPSTREAM=http://127.0.0.1:8099
+# Run:    python replay.py run recordings
+#         pushes every recording through parse -> diff -> render in-process and reports throughput
+import argparse
+import bisect
+import gzip
+import hashlib
+import os
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MATCH_URL_RE = re.compile(r'/live-cricket-scorecard/(\d+)')
+
+def recording_key(url):
+    match = MATCH_URL_RE.search(url)
+    return match.group(1) if match else hashlib.sha1(url.encode()).hexdigest()[:10]
+
+def save_recording(directory, url, body, fetched_at=None):
+    folder = os.path.join(directory, recording_key(url))
+    os.makedirs(folder, exist_ok=True)
+    stamp = int((fetched_at or time.time()) * 1000)
+    path = os.path.join(folder, f"{stamp}.html.gz")
+    # Write then rename so a concurrent replay never reads half a file
+    with open(path + '.tmp', 'wb') as f:
+        f.write(gzip.compress(body, 6))
+    os.replace(path + '.tmp', path)
+    return path
+
+# {match id: [(unix ms, path)]} sorted by time
+def load_recordings(directory):
+    recordings = {}
+    for name in sorted(os.listdir(directory)):
+        folder = os.path.join(directory, name)
+        if not os.path.isdir(folder):
+            continue
+        entries = []
+        for filename in os.listdir(folder):
+            stamp = filename.split('.', 1)[0]
+            if filename.endswith('.html.gz') and stamp.isdigit():
+                entries.append((int(stamp), os.path.join(folder, filename)))
+        if entries:
+            recordings[name] = sorted(entries)
+    return recordings
+
+def read_recording(path):
+    with open(path, 'rb') as f:
+        return gzip.decompress(f.read())
+
+# Plays every match's recordings back on its own recorded timeline, scaled by speed
+class ReplaySource:
+    def __init__(self, directory, speed=1.0, loop=False):
+        self.recordings = load_recordings(directory)
+        self.speed = speed
+        self.loop = loop
+        self.started = time.time()
+        self._bodies = {}
+
+    def page(self, match_id):
+        entries = self.recordings.get(match_id)
+        if not entries:
+            return None
+        first, last = entries[0][0], entries[-1][0]
+        offset = (time.time() - self.started) * 1000 * self.speed
+        if self.loop and last > first:
+            offset %= last - first + 1
+        index = bisect.bisect_right(entries, (first + offset, '￿')) - 1
+        path = entries[max(index, 0)][1]
+        if path not in self._bodies:
+            self._bodies[path] = read_recording(path)
+        return self._bodies[path]
+
+def make_handler(source):
+    class ReplayHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            match = MATCH_URL_RE.match(self.path)
+            body = source.page(match.group(1)) if match else None
+            if body is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            # Behave like the real upstream for conditional requests
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ReplayHandler
+
+def serve(args):
+    source = ReplaySource(args.directory, speed=args.speed, loop=args.loop)
+    if not source.recordings:
+        raise SystemExit(f"No recordings found in {args.directory}")
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(source))
+    server.daemon_threads = True
+    print(f"Replaying {len(source.recordings)} matches at {args.speed}x on http://{args.host}:{args.port}")
+    print(f"Run the app with CRICBLAST_UPSTREAM=http://{args.host}:{args.port} "
+          f"CRICBLAST_MATCHES={','.join(source.recordings)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+# Drive parse -> diff -> render for every recording as fast as possible
+def run(args):
+    import app
+
+    recordings = load_recordings(args.directory)
+    if not recordings:
+        raise SystemExit(f"No recordings found in {args.directory}")
+    totals = {'parse': 0.0, 'publish': 0.0, 'render': 0.0}
+    snapshots = pages = 0
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        for key, entries in recordings.items():
+            match_id = int(key) if key.isdigit() else 0
+            poller = app.ScorePoller(match_id, f"replay:{key}")
+            for _, path in entries:
+                html = read_recording(path).decode('utf-8', 'replace')
+
+                start = time.perf_counter()
+                data = app.parse_scorecard(html)
+                totals['parse'] += time.perf_counter() - start
+                if isinstance(data, dict):
+                    continue
+
+                start = time.perf_counter()
+                poller.publish(data)
+                totals['publish'] += time.perf_counter() - start
+                snapshots += 1
+
+                start = time.perf_counter()
+                for page in range(1, 2 * len(data.innings) + 1):
+                    app.render_page(match_id, poller.snapshot, page, f"/match/{match_id}")
+                    pages += 1
+                totals['render'] += time.perf_counter() - start
+    elapsed = time.perf_counter() - started
+
+    print(f"{snapshots} snapshots, {pages} pages in {elapsed:.2f}s")
+    print(f"throughput: {snapshots / elapsed:.1f} snapshots/s, {pages / elapsed:.1f} pages/s")
+    for stage, seconds in totals.items():
+        print(f"  {stage:<8} {seconds * 1000 / max(snapshots, 1):8.2f} ms per snapshot")
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded upstream scorecard pages')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='serve recordings as a local stand-in for the upstream')
+    serve_parser.add_argument('directory')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8099)
+    serve_parser.add_argument('--speed', type=float, default=1.0, help='1 = real time, 60 = a minute per second')
+    serve_parser.add_argument('--loop', action='store_true', help='start over after the last recording')
+    serve_parser.set_defaults(func=serve)
+
+    run_parser = commands.add_parser('run', help='push recordings through the pipeline and report throughput')
+    run_parser.add_argument('directory')
+    run_parser.add_argument('--rounds', type=int, default=1)
+    run_parser.set_defaults(func=run)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
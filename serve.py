@@ -0,0 +1,149 @@
+# Production entry point: one poller process plus a pool of web workers
+#
+#   python serve.py --workers 4 --port 5000
+#
+# The poller is the only process that talks to the upstream, it writes snapshots to the SQLite
+# store (CRICBLAST_STORE) and runs the push channel. Web workers are gunicorn processes that follow
+# the store, so N workers still cost one upstream fetch per poll. Both parts can also be run on
+# their own with `serve.py poller` and `serve.py web`.
+#
+# SIGTERM/SIGINT shut down gracefully: web workers stop accepting connections and finish in-flight
+# requests, then the poller lets running scrapes complete and closes the store.
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+def load_app(role):
+    # The role is read once at import time
+    os.environ['CRICBLAST_ROLE'] = role
+    import app
+    if not app.STORE_PATH:
+        raise SystemExit('Multi-process mode shares snapshots through the store, set CRICBLAST_STORE')
+    return app
+
+def serve_http(application, host, port, on_stop):
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, application, threaded=True)
+
+    def stop(signum, frame):
+        # shutdown() blocks until serve_forever returns, so it can't run in the handler itself
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        server.serve_forever()
+    finally:
+        on_stop()
+
+# Scrapes every match, persists changes and serves /healthz, /readyz and /metrics on a local port
+def run_poller(args):
+    app = load_app('poller')
+    app.start_background()
+    print(f"Poller for {len(app.scheduler.pollers)} matches, status on http://{args.poller_host}:{args.poller_port}")
+    serve_http(app.app, args.poller_host, args.poller_port, lambda: app.shutdown(args.graceful_timeout))
+
+def gunicorn_application(application, options, on_worker_exit):
+    class WebApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+            self.cfg.set('worker_exit', lambda server, worker: on_worker_exit())
+
+        def load(self):
+            return application
+
+    return WebApplication()
+
+def run_web(args):
+    app = load_app('web')
+    if BaseApplication is None:
+        if args.workers > 1:
+            raise SystemExit('Multiple web workers need gunicorn: pip install gunicorn')
+        print(f"Serving on http://{args.host}:{args.port} (single worker, gunicorn is not installed)")
+        serve_http(app.app, args.host, args.port, lambda: app.shutdown(args.graceful_timeout))
+        return
+    options = {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': 5,
+        # Importing the app starts nothing, so it is safe to load once before forking
+        'preload_app': True,
+    }
+    gunicorn_application(app.app, options, lambda: app.shutdown(args.graceful_timeout)).run()
+
+def child_command(args, command):
+    argv = [sys.executable, os.path.abspath(__file__), command,
+            '--host', args.host, '--port', str(args.port),
+            '--workers', str(args.workers), '--threads', str(args.threads),
+            '--poller-host', args.poller_host, '--poller-port', str(args.poller_port),
+            '--graceful-timeout', str(args.graceful_timeout)]
+    return subprocess.Popen(argv)
+
+def stop_child(process, timeout):
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+# Supervises the poller and the web server, restarting the poller if it dies
+def run_all(args):
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+
+    poller = child_command(args, 'poller')
+    web = child_command(args, 'web')
+    status = 0
+    while not stopping.wait(1):
+        if web.poll() is not None:
+            status = web.returncode
+            break
+        if poller.poll() is not None:
+            print(f"Poller exited with {poller.returncode}, restarting", file=sys.stderr)
+            time.sleep(1)
+            poller = child_command(args, 'poller')
+
+    # Stop taking requests first, the poller keeps the store current while they drain
+    stop_child(web, args.graceful_timeout + 5)
+    stop_child(poller, args.graceful_timeout + 5)
+    sys.exit(status)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run cricblast with a shared poller and multiple web workers')
+    parser.add_argument('command', nargs='?', default='all', choices=['all', 'poller', 'web'])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=(os.cpu_count() or 1) * 2 + 1)
+    parser.add_argument('--threads', type=int, default=4, help='request threads per web worker')
+    parser.add_argument('--poller-host', default='127.0.0.1')
+    parser.add_argument('--poller-port', type=int, default=5002, help='health and metrics of the poller')
+    parser.add_argument('--graceful-timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    if args.command == 'poller':
+        run_poller(args)
+    elif args.command == 'web':
+        run_web(args)
+    else:
+        run_all(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+// Single-payload scorecard: every page is drawn from one embedded copy of the match, so paging
+// with the arrow keys never goes back to the server. Push updates are merged into that copy.
+let match = null;
+let page = 1;
+
+// Packed rows are arrays in the payload's column order, turn them back into objects
+function unpack(payload) {
+    payload.innings.forEach(innings => {
+        Object.entries(payload.columns).forEach(([table, columns]) => {
+            innings[table] = innings[table].map(row => Object.fromEntries(columns.map((name, index) => [name, row[index]])));
+        });
+    });
+    return payload;
+}
+
+function table(headers, rows, highlight, onRowClick) {
+    const head = element('tr', {}, headers.map((text, index) =>
+        element('th', {textContent: text, className: index === highlight ? 'highlight' : ''})));
+    const body = element('tbody', {}, rows.map(cells => {
+        const row = element('tr', {}, cells.map((text, index) =>
+            element('td', {textContent: text, className: index === highlight ? 'highlight' : ''})));
+        if (onRowClick) row.onclick = () => onRowClick(row);
+        return row;
+    }));
+    return element('table', {}, [element('thead', {}, [head]), body]);
+}
+
+function section(className, title, content) {
+    return element('div', {className}, [element('h3', {textContent: title}), ...content]);
+}
+
+function pageCount() {
+    return 2 * match.innings.length;
+}
+
+function battingPage(innings) {
+    const stands = innings.stats ? innings.stats.partnerships : [];
+    return [
+        section('player-scores', 'Batting', [table(
+            ['Player', 'Dismissal', 'R', 'B', '4s', '6s', 'SR'],
+            innings.batting.map(player => [stat(player.name), stat(player.dismissal), stat(player.runs),
+                stat(player.balls), stat(player.fours), stat(player.sixes), stat(player.strike_rate, 2)]),
+            2, showRowDetails)]),
+        section('fall-of-wickets-content', 'Fall of Wickets', [
+            element('p', {textContent: `Fall of Wickets: ${listText(innings.fall_of_wickets.map(fallText))}`}),
+            element('h3', {textContent: 'Partnerships'}),
+            element('p', {textContent: listText(stands.map(standText))})]),
+    ];
+}
+
+function bowlingPage(innings) {
+    const spells = (innings.stats ? innings.stats.spells : []).filter(spell => spell.balls);
+    return [
+        section('bowling-scores', 'Bowling', [table(
+            ['Bowler', 'O', 'M', 'R', 'W', 'NB', 'WD', 'ECO'],
+            innings.bowling.map(bowler => [stat(bowler.name), overs(bowler.balls), stat(bowler.maidens),
+                stat(bowler.runs), stat(bowler.wickets), stat(bowler.nb), stat(bowler.wd), stat(bowler.economy, 2)]))]),
+        section('fall-of-wickets-content', 'Current Spells', [
+            element('p', {textContent: listText(spells.map(spellText))})]),
+    ];
+}
+
+function render() {
+    page = Math.min(Math.max(page, 1), pageCount());
+    const innings = match.innings[Math.floor((page - 1) / 2)];
+    document.querySelector('.team-name').textContent = stat(innings.team);
+    document.querySelector('.score').textContent = stat(innings.score);
+    document.getElementById('match-stats').replaceChildren(...summary(innings.stats));
+    document.getElementById('page-content').replaceChildren(...(page % 2 ? battingPage(innings) : bowlingPage(innings)));
+}
+
+function goTo(next) {
+    page = next;
+    render();
+    history.replaceState(null, '', `${SCORECARD.baseUrl}?page=${page}`);
+}
+
+function mergeRows(rows, changed) {
+    changed.forEach(row => {
+        const index = rows.findIndex(item => item.name === row.name);
+        if (index >= 0) rows[index] = row; else rows.push(row);
+    });
+}
+
+// Deltas carry changed rows only, full updates carry every row of every innings
+function merge(update) {
+    update.innings.forEach(entry => {
+        const current = match.innings.find(innings => innings.number === entry.number);
+        if (!current || !update.delta) {
+            const stats = current ? current.stats : null;
+            match.innings = match.innings.filter(innings => innings.number !== entry.number)
+                .concat([Object.assign(entry, {stats})]).sort((a, b) => a.number - b.number);
+            return;
+        }
+        ['team', 'score', 'runs', 'wickets', 'balls'].forEach(name => { current[name] = entry[name]; });
+        mergeRows(current.batting, entry.batting);
+        mergeRows(current.bowling, entry.bowling);
+        current.fall_of_wickets.push(...entry.fall_of_wickets);
+    });
+    (update.stats || []).forEach(stats => {
+        const innings = match.innings.find(item => item.number === stats.number);
+        if (innings) innings.stats = stats;
+    });
+    Object.assign(match, {version: update.version, state: update.state, status: update.status});
+}
+
+// Arrow key navigation, drawn from memory
+document.addEventListener('DOMContentLoaded', function () {
+    match = unpack(JSON.parse(document.getElementById('match-data').textContent));
+    page = parseInt(new URLSearchParams(location.search).get('page'), 10) || 1;
+    render();
+    subscribe(match.version, update => {
+        merge(update);
+        render();
+    });
+    document.addEventListener('keydown', function (event) {
+        if (event.key === 'ArrowRight') {
+            goTo(page < pageCount() ? page + 1 : 1);
+        } else if (event.key === 'ArrowLeft') {
+            goTo(page > 1 ? page - 1 : pageCount());
+        }
+    });
+});
@@ -0,0 +1,70 @@
+// Live updates: patch changed rows in place instead of reloading the page
+let pageCount = SCORECARD.pageCount;
+
+function patchRow(tbody, name, cells) {
+    let row = Array.from(tbody.rows).find(item => item.dataset.name === name);
+    if (!row) {
+        row = tbody.insertRow();
+        row.dataset.name = name;
+        cells.forEach(() => row.insertCell());
+        if (tbody.dataset.table === 'batting') row.onclick = () => showRowDetails(row);
+    }
+    cells.forEach((value, index) => { row.cells[index].textContent = value; });
+}
+
+function patchInnings(innings, delta) {
+    document.querySelector('.score').textContent = stat(innings.score);
+    const tbody = document.getElementById('scorecard-rows');
+    if (tbody.dataset.table === 'batting') {
+        innings.batting.forEach(player => patchRow(tbody, player.name, [
+            stat(player.name), stat(player.dismissal), stat(player.runs), stat(player.balls),
+            stat(player.fours), stat(player.sixes), stat(player.strike_rate, 2)]));
+        const fallen = innings.fall_of_wickets.map(fallText);
+        const list = document.getElementById('fall-of-wickets');
+        if (!delta) {
+            list.textContent = listText(fallen);
+        } else if (fallen.length) {
+            list.textContent = list.textContent === 'N/A' ? fallen.join(', ') : `${list.textContent}, ${fallen.join(', ')}`;
+        }
+    } else {
+        innings.bowling.forEach(bowler => patchRow(tbody, bowler.name, [
+            stat(bowler.name), overs(bowler.balls), stat(bowler.maidens), stat(bowler.runs),
+            stat(bowler.wickets), stat(bowler.nb), stat(bowler.wd), stat(bowler.economy, 2)]));
+    }
+}
+
+// Derived stats arrive in full for every innings in an update
+function patchStats(stats) {
+    const line = document.getElementById('match-stats');
+    if (line) line.replaceChildren(...summary(stats));
+    const partnerships = document.getElementById('partnerships');
+    if (partnerships) partnerships.textContent = listText(stats.partnerships.map(standText));
+    const spells = document.getElementById('spells');
+    if (spells) spells.textContent = listText(stats.spells.filter(spell => spell.balls).map(spellText));
+}
+
+// Deltas carry changed rows only, full updates carry every row of every innings
+function patch(update) {
+    update.innings.forEach(innings => {
+        pageCount = Math.max(pageCount, 2 * innings.number);
+        if (innings.number === SCORECARD.inningsNumber) patchInnings(innings, update.delta);
+    });
+    (update.stats || []).forEach(stats => {
+        if (stats.number === SCORECARD.inningsNumber) patchStats(stats);
+    });
+}
+
+// Arrow key navigation
+document.addEventListener('DOMContentLoaded', function () {
+    subscribe(SCORECARD.version, patch);
+    document.addEventListener('keydown', function (event) {
+        let currentPage = SCORECARD.page;
+        if (event.key === 'ArrowRight') {
+            let nextPage = currentPage < pageCount ? currentPage + 1 : 1;
+            window.location.href = `${SCORECARD.baseUrl}?page=${nextPage}`;
+        } else if (event.key === 'ArrowLeft') {
+            let previousPage = currentPage > 1 ? currentPage - 1 : pageCount;
+            window.location.href = `${SCORECARD.baseUrl}?page=${previousPage}`;
+        }
+    });
+});
@@ -0,0 +1,93 @@
+// Helpers shared by both scorecard pages, loaded before scorecard.js or match_app.js
+function stat(value, digits) {
+    if (value === null || value === undefined) return 'N/A';
+    return digits === undefined ? String(value) : value.toFixed(digits);
+}
+
+function overs(balls) {
+    if (balls === null || balls === undefined) return 'N/A';
+    return balls % 6 ? `${Math.floor(balls / 6)}.${balls % 6}` : String(balls / 6);
+}
+
+function element(tag, props, children) {
+    const node = Object.assign(document.createElement(tag), props || {});
+    (children || []).forEach(child => node.append(child));
+    return node;
+}
+
+function listText(items) {
+    return items.length ? items.join(', ') : 'N/A';
+}
+
+function fallText(fall) {
+    return `${fall.wicket}-${fall.score} (${fall.batsman}, ${overs(fall.balls)})`;
+}
+
+function standText(stand) {
+    return `${stand.wicket}: ${stand.runs} (${stat(stand.balls)}) ${stand.batsmen.join(' & ')}${stand.unbroken ? '*' : ''}`;
+}
+
+function spellText(spell) {
+    return `${spell.bowler} (${spell.number}): ${overs(spell.balls)}-${stat(spell.maidens)}-${stat(spell.runs)}-${stat(spell.wickets)}`;
+}
+
+// The match stats line, one span per item
+function summary(stats) {
+    if (!stats) return [];
+    const stand = stats.partnerships.length && stats.partnerships[stats.partnerships.length - 1];
+    const items = [`RR ${stat(stats.run_rate, 2)}`];
+    if (stand && stand.unbroken) items.push(`Partnership ${stand.runs} (${stat(stand.balls)})`);
+    if (stats.target) items.push(`Target ${stats.target}`);
+    if (stats.balls_left) items.push(`Need ${stats.runs_needed} from ${stats.balls_left} balls`);
+    if (stats.required_rate !== null) items.push(`RRR ${stat(stats.required_rate, 2)}`);
+    if (stats.projected) items.push(`Projected ${stats.projected}`);
+    return items.map(text => element('span', {textContent: text}));
+}
+
+// Push updates from the version the page was drawn at, onUpdate gets each parsed update
+function subscribe(since, onUpdate) {
+    const pushPort = SCORECARD.pushPort;
+    if (!pushPort || !window.EventSource) return;
+    const base = SCORECARD.pushUrl || `${location.protocol}//${location.hostname}:${pushPort}`;
+    const source = new EventSource(`${base}/events/${SCORECARD.matchId}?since=${since}`);
+    source.addEventListener('scorecard', function (event) {
+        onUpdate(JSON.parse(event.data));
+        // Fresh data is flowing again
+        const notice = document.getElementById('stale-notice');
+        if (notice) notice.remove();
+    });
+}
+
+// Degraded mode: the page is the last good scorecard, keep its age current
+function showStaleAge() {
+    const notice = document.getElementById('stale-notice');
+    if (!notice || !SCORECARD.staleSince) return;
+    const minutes = Math.floor((Date.now() / 1000 - SCORECARD.staleSince) / 60);
+    notice.querySelector('.stale-age').textContent = minutes > 0 ? `(${minutes} min ago)` : '';
+}
+
+// Modal handling, cell text goes in as text nodes so a player name can't inject markup
+function showPlayerDetails(playerName, dismissal, runs, balls, fours, sixes, strikeRate) {
+    const modal = document.getElementById('playerModal');
+    const modalContent = document.getElementById('modalContent');
+    modal.style.display = 'block';
+    modalContent.replaceChildren(
+        element('div', {className: 'modal-header', textContent: playerName}),
+        ...[['Dismissal', dismissal], ['Runs', runs], ['Balls', balls], ['Fours', fours], ['Sixes', sixes],
+            ['Strike Rate', strikeRate]].map(([label, value]) => element('div', {textContent: `${label}: ${value}`})));
+}
+
+function showRowDetails(row) {
+    const cells = Array.from(row.cells, cell => cell.textContent);
+    showPlayerDetails(...cells);
+}
+
+function closeModal() {
+    const modal = document.getElementById('playerModal');
+    modal.style.display = 'none';
+}
+
+document.addEventListener('DOMContentLoaded', function () {
+    showStaleAge();
+    setInterval(showStaleAge, 30000);
+});
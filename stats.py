@@ -0,0 +1,203 @@
+# Derived statistics: run rates, partnerships, targets, projections and bowling spells
+# A StatsTracker follows one match snapshot by snapshot and only recomputes innings that changed,
+# spells can only be worked out this way since the scorecard only shows whole-innings figures.
+import re
+
+from models import Record, balls_to_overs
+
+# "Delhi need 42 runs in 30 balls", the upstream's own chase figures win over ours
+CHASE_RE = re.compile(r'need\s+(\d+)\s+runs?\s+(?:in|from)\s+(\d+)\s+balls?', re.I)
+# Balls per innings of the limited-overs formats a match can be registered as
+FORMAT_BALLS = {'t20': 120, 'odi': 300}
+# Status lines only first-class matches have: "Day 2: Stumps", "Gujarat lead by 47 runs", "won by an innings"
+FIRST_CLASS_RE = re.compile(r'\bday\s+\d+\b|\bstumps\b|\b(?:lead|trail)s?\s+by\b|\binnings\s+and\b', re.I)
+# A bowler who sits out more than one over has started a new spell
+SPELL_GAP_OVERS = 2
+
+def run_rate(runs, balls):
+    if runs is None or not balls:
+        return None
+    return round(runs * 6 / balls, 2)
+
+class Partnership(Record):
+    # wicket: the wicket that ended it, or the next wicket for the unbroken stand
+    __slots__ = ('wicket', 'runs', 'balls', 'batsmen', 'unbroken')
+
+    def __init__(self, wicket, runs, balls, batsmen, unbroken):
+        self.wicket = wicket
+        self.runs = runs
+        self.balls = balls
+        self.batsmen = tuple(batsmen or ())
+        self.unbroken = unbroken
+
+class Spell(Record):
+    # Figures of a bowler's current spell, number counts spells in this innings
+    __slots__ = ('bowler', 'number', 'balls', 'maidens', 'runs', 'wickets')
+
+    def __init__(self, bowler, number, balls, maidens, runs, wickets):
+        self.bowler = bowler
+        self.number = number
+        self.balls = balls
+        self.maidens = maidens
+        self.runs = runs
+        self.wickets = wickets
+
+    @property
+    def overs(self):
+        return balls_to_overs(self.balls)
+
+class InningsStats(Record):
+    __slots__ = ('number', 'run_rate', 'projected', 'target', 'runs_needed', 'balls_left', 'required_rate',
+                 'partnerships', 'spells')
+    nested = {'partnerships': Partnership, 'spells': Spell}
+
+    def __init__(self, number, run_rate, projected, target, runs_needed, balls_left, required_rate,
+                 partnerships, spells):
+        self.number = number
+        self.run_rate = run_rate
+        self.projected = projected
+        self.target = target
+        self.runs_needed = runs_needed
+        self.balls_left = balls_left
+        self.required_rate = required_rate
+        self.partnerships = tuple(partnerships)
+        self.spells = tuple(spells)
+
+    @property
+    def current_partnership(self):
+        if self.partnerships and self.partnerships[-1].unbroken:
+            return self.partnerships[-1]
+        return None
+
+# Batting rows are in batting order, so replaying the fall of wickets tells who was in each stand
+def partnerships(innings):
+    order = [row.name for row in innings.batting]
+    crease, waiting = order[:2], order[2:]
+    stands = []
+    runs, balls = 0, 0
+    for fall in innings.fall_of_wickets:
+        stand_balls = stand_length(fall.balls, balls, innings.balls)
+        stands.append(Partnership(fall.wicket, fall.score - runs, stand_balls, crease, False))
+        runs, balls = fall.score, fall.balls
+        if fall.batsman in crease:
+            crease = [name for name in crease if name != fall.batsman]
+            if waiting:
+                crease.append(waiting.pop(0))
+    if innings.runs is not None and (innings.wickets or 0) < 10 and crease:
+        stand_balls = stand_length(innings.balls, balls, innings.balls)
+        stands.append(Partnership(len(innings.fall_of_wickets) + 1, innings.runs - runs, stand_balls, crease, True))
+    return stands
+
+# Balls between two points of an innings, None when either is unknown or they don't fit the innings:
+# a fall of wickets out of order or past the innings overs is a bad page, not a negative stand
+def stand_length(end, start, innings_balls):
+    if end is None or start is None or end < start or (innings_balls is not None and end > innings_balls):
+        return None
+    return end - start
+
+def first_class(match):
+    return len(match.innings) > 2 or match.state == 'stump' or bool(FIRST_CLASS_RE.search(match.status or ''))
+
+# Balls per innings, only when the match is known to be limited-overs: from the upstream's chase
+# line or the registered format. Innings lengths alone can't tell a T20 from a first-class morning.
+def innings_limit(match, chase, match_format=None):
+    if first_class(match):
+        return None
+    if chase is not None and match.innings and match.innings[-1].balls is not None:
+        return match.innings[-1].balls + chase[1]
+    return FORMAT_BALLS.get(match_format)
+
+# Runs the batting side needs to win, only known in the last innings of the match
+def chase_target(match, innings, limit):
+    final = 2 if limit else 4
+    if innings.number != final or innings.runs is None:
+        return None
+    opponents = sum(other.runs or 0 for other in match.innings if other.team != innings.team)
+    own = sum(other.runs or 0 for other in match.innings
+              if other.team == innings.team and other.number < innings.number)
+    return opponents - own + 1
+
+# Keeps each innings' stats and each bowler's spell between snapshots
+class StatsTracker:
+    # match_format: a FORMAT_BALLS key when the match is known to be limited-overs
+    def __init__(self, match_format=None):
+        self.match_format = match_format
+        # innings number -> InningsStats, replaced wholesale so readers never see a partial update
+        self.innings = {}
+        # innings number -> {bowler: (over of their last ball, spell number, figures at spell start)}
+        self._bowlers = {}
+        self._previous = {}
+
+    def update(self, match, changed_innings=None):
+        if changed_innings is None:
+            changed_innings = [innings.number for innings in match.innings
+                               if self._previous.get(innings.number) != innings]
+        changed = set(changed_innings)
+        chase = CHASE_RE.search(match.status or '')
+        chase = (int(chase.group(1)), int(chase.group(2))) if chase else None
+        limit = innings_limit(match, chase, self.match_format)
+
+        stats = {}
+        for innings in match.innings:
+            current = self.innings.get(innings.number)
+            # Targets and projections of the live innings also depend on the status line
+            if current is not None and innings.number not in changed and innings is not match.innings[-1]:
+                stats[innings.number] = current
+                continue
+            spells = self._spells(innings, self._previous.get(innings.number))
+            stats[innings.number] = self._innings_stats(match, innings, limit, chase, spells)
+
+        self._previous = {innings.number: innings for innings in match.innings}
+        self.innings = stats
+        return stats
+
+    def _innings_stats(self, match, innings, limit, chase, spells):
+        rate = run_rate(innings.runs, innings.balls)
+        live = (innings.wickets or 0) < 10 and innings is match.innings[-1]
+        projected = target = runs_needed = balls_left = required = None
+        if limit and live and rate is not None and innings.balls < limit:
+            projected = round(innings.runs + rate * (limit - innings.balls) / 6)
+        target = chase_target(match, innings, limit)
+        if target is not None:
+            runs_needed = max(target - innings.runs, 0)
+            if chase is not None and innings is match.innings[-1]:
+                runs_needed, balls_left = chase
+            elif limit and innings.balls is not None:
+                balls_left = max(limit - innings.balls, 0)
+            if balls_left:
+                required = run_rate(runs_needed, balls_left)
+            # Projections make no sense once the target caps the innings
+            projected = None
+        return InningsStats(innings.number, rate, projected, target, runs_needed, balls_left, required,
+                            partnerships(innings), spells)
+
+    def _spells(self, innings, before):
+        previous_rows = {row.name: row for row in before.bowling} if before else {}
+        states = dict(self._bowlers.get(innings.number, {}))
+        over = (innings.balls - 1) // 6 if innings.balls else 0
+        for row in innings.bowling:
+            old = previous_rows.get(row.name)
+            state = states.get(row.name)
+            if state is None:
+                # First sight of this bowler: on a cold start the whole innings counts as one spell
+                states[row.name] = (over, 1, None)
+            elif old is not None and (row.balls or 0) > (old.balls or 0):
+                last_over, number, start = state
+                if over - last_over > SPELL_GAP_OVERS:
+                    states[row.name] = (over, number + 1, old)
+                else:
+                    states[row.name] = (over, number, start)
+        self._bowlers[innings.number] = states
+
+        return [Spell(row.name, states[row.name][1], *figures_since(row, states[row.name][2]))
+                for row in innings.bowling]
+
+# Balls, maidens, runs and wickets of a bowling row since an earlier row of the same bowler
+def figures_since(row, start):
+    figures = []
+    for name in ('balls', 'maidens', 'runs', 'wickets'):
+        value = getattr(row, name)
+        if value is not None and start is not None:
+            value -= getattr(start, name) or 0
+        figures.append(value)
+    return figures
@@ -0,0 +1,200 @@
+# Append-only history of scorecard snapshots and change events in SQLite (WAL mode)
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from models import Match
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    match_id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    state TEXT,
+    innings_versions TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    PRIMARY KEY (match_id, version)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    match_id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    recorded_at REAL NOT NULL,
+    innings INTEGER,
+    player TEXT,
+    type TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+
+-- Newest stored version of each match, kept by every insert so polling for changes never scans snapshots
+CREATE TABLE IF NOT EXISTS heads (
+    match_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL,
+    stored_at REAL NOT NULL
+);
+
+-- Last time each match was checked upstream, unchanged pages don't add a snapshot
+CREATE TABLE IF NOT EXISTS freshness (
+    match_id INTEGER PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    error TEXT
+);
+
+-- Progress of backfill runs, written in the same transaction as the snapshots of a batch
+CREATE TABLE IF NOT EXISTS backfill (
+    match_id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS events_by_match ON events (match_id, recorded_at);
+CREATE INDEX IF NOT EXISTS events_by_innings ON events (match_id, innings, recorded_at);
+CREATE INDEX IF NOT EXISTS events_by_player ON events (player, recorded_at);
+"""
+
+# Snapshots are stored as zlib-compressed compact JSON, a full 4-innings card is a few KB
+def pack(match):
+    return zlib.compress(json.dumps(match.to_dict(), separators=(',', ':')).encode('utf-8'), 6)
+
+def unpack(payload):
+    return Match.from_dict(json.loads(zlib.decompress(payload)))
+
+class ScoreStore:
+    def __init__(self, path):
+        self.path = path
+        # One shared connection, writes are serialised by the lock and WAL lets reads run alongside
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def append(self, match_id, snapshot, events=()):
+        self.append_batch([(match_id, snapshot, events)])
+
+    # Many snapshots and backfill checkpoints [(match_id, status, error)] in one transaction
+    def append_batch(self, entries, checkpoints=()):
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                for match_id, snapshot, events in entries:
+                    self._insert(match_id, snapshot, events)
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO backfill VALUES (?, ?, ?, ?)',
+                    [(match_id, status, error, time.time()) for match_id, status, error in checkpoints])
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def _insert(self, match_id, snapshot, events):
+        innings_versions = json.dumps({str(number): version for number, version in snapshot.innings_versions.items()})
+        self._db.execute(
+            'INSERT OR IGNORE INTO snapshots VALUES (?, ?, ?, ?, ?, ?)',
+            (match_id, snapshot.version, snapshot.fetched_at, snapshot.data.state,
+             innings_versions, pack(snapshot.data)))
+        # Backfilled snapshots can be older than the stored head, it only moves forward
+        self._db.execute(
+            'INSERT INTO heads VALUES (?, ?, ?) ON CONFLICT (match_id) DO UPDATE SET '
+            'version = MAX(version, excluded.version), stored_at = MAX(stored_at, excluded.stored_at)',
+            (match_id, snapshot.version, snapshot.fetched_at))
+        self._db.executemany(
+            'INSERT INTO events (match_id, version, recorded_at, innings, player, type, payload) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(match_id, snapshot.version, snapshot.fetched_at, event.get('innings'),
+              event.get('player') or event.get('bowler'), event['type'],
+              json.dumps(event, separators=(',', ':'))) for event in events])
+
+    # Backfill progress: {match_id: (status, error)}
+    def checkpoints(self):
+        with self._lock:
+            rows = self._db.execute('SELECT match_id, status, error FROM backfill').fetchall()
+        return {match_id: (status, error) for match_id, status, error in rows}
+
+    def touch(self, match_id, fetched_at, error=None):
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO freshness VALUES (?, ?, ?)', (match_id, fetched_at, error))
+
+    # Newest version of every stored match from the heads table: {match_id: (version, fetched_at, error)}
+    def heads(self):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT h.match_id, h.version, h.stored_at, f.fetched_at, f.error '
+                'FROM heads h LEFT JOIN freshness f ON f.match_id = h.match_id').fetchall()
+        return {match_id: (version, max(stored_at, checked_at or 0), error)
+                for match_id, version, stored_at, checked_at, error in rows}
+
+    # Latest snapshot of every stored match: {match_id: (version, fetched_at, innings_versions, Match)}
+    def latest(self, match_ids=None):
+        query = ('SELECT s.match_id, s.version, s.fetched_at, s.innings_versions, s.payload FROM heads h '
+                 'JOIN snapshots s ON s.match_id = h.match_id AND s.version = h.version')
+        params = []
+        if match_ids is not None:
+            match_ids = list(match_ids)
+            if not match_ids:
+                return {}
+            query += f" WHERE h.match_id IN ({', '.join('?' * len(match_ids))})"
+            params.extend(match_ids)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        latest = {}
+        for match_id, version, fetched_at, innings_versions, payload in rows:
+            versions = {int(number): value for number, value in json.loads(innings_versions).items()}
+            latest[match_id] = (version, fetched_at, versions, unpack(payload))
+        return latest
+
+    # Snapshots of one match in a time range, oldest first: [(version, fetched_at, Match)]
+    def snapshots(self, match_id, start=None, end=None, limit=None):
+        query = 'SELECT version, fetched_at, payload FROM snapshots WHERE match_id = ?'
+        params = [match_id]
+        # Versions are publish times in ms, so a time range is a primary key range
+        if start is not None:
+            query += ' AND version >= ?'
+            params.append(int(start * 1000))
+        if end is not None:
+            query += ' AND version < ?'
+            params.append(int(end * 1000))
+        query += ' ORDER BY version'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [(version, fetched_at, unpack(payload)) for version, fetched_at, payload in rows]
+
+    # Change events filtered by match, innings, player, type and time range, oldest first
+    def events(self, match_id=None, innings=None, player=None, types=None, start=None, end=None, limit=None):
+        clauses, params = [], []
+        for column, value in (('match_id', match_id), ('innings', innings), ('player', player)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if types:
+            clauses.append(f"type IN ({', '.join('?' * len(types))})")
+            params.extend(types)
+        if start is not None:
+            clauses.append('recorded_at >= ?')
+            params.append(start)
+        if end is not None:
+            clauses.append('recorded_at < ?')
+            params.append(end)
+        query = 'SELECT match_id, version, recorded_at, payload FROM events'
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' ORDER BY recorded_at, id'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [dict(json.loads(payload), match_id=event_match, version=version, recorded_at=recorded_at)
+                for event_match, version, recorded_at, payload in rows]
@@ -0,0 +1,65 @@
+import pytest
+
+import aggregate
+from aggregate import BOARDS, Season
+from models import BattingRow, BowlingRow, Innings, Match
+
+@pytest.fixture(params=['array', 'numpy'])
+def backend(request, monkeypatch):
+    # The numpy module when it is installed, None for the array('q') fallback
+    module = pytest.importorskip('numpy') if request.param == 'numpy' else None
+    monkeypatch.setattr(aggregate, 'numpy', module)
+
+def innings(number, team, score, batting, bowling):
+    return Innings.from_text(number, f"{team} Innings", score,
+                             [BattingRow.from_text(name, dismissal, runs, balls, '1', '0', '0.00')
+                              for name, dismissal, runs, balls in batting],
+                             [BowlingRow.from_text(name, overs, '0', runs, wickets, '0', '0', '0.00')
+                              for name, overs, runs, wickets in bowling], '')
+
+def match(home, away, runs, second_innings=True):
+    first = innings(1, home, f"{runs}-2 (20.0 Ov)",
+                    [('A ' + home, 'c X b Y', str(runs // 2), '30'), ('B ' + home, 'not out', str(runs // 2), '40')],
+                    [('C ' + away, '10', '60', '1'), ('D ' + away, '10', str(runs - 60), '1')])
+    if not second_innings:
+        return Match('live', '', [first])
+    second = innings(2, away, '90-1 (12.0 Ov)',
+                     [('C ' + away, 'b A', '50', '36'), ('D ' + away, 'not out', '40', '36')],
+                     [('A ' + home, '6', '40', '1'), ('B ' + home, '6', '50', '0')])
+    return Match('live', '', [first, second])
+
+# Every row of every board, ties rank by first appearance which the order of the updates changes
+def boards(season, match_ids=None):
+    return {board: sorted(season.leaderboard(board, 100, match_ids), key=repr) for board in BOARDS}
+
+def test_live_updates_match_a_fresh_load(backend):
+    season = Season()
+    season.add(1, 1, match('Mumbai', 'Delhi', 120, second_innings=False))
+    season.add(2, 1, match('Chennai', 'Kolkata', 150))
+    # Whole-season sums cached before the updates, so they are kept up to date rather than recomputed
+    boards(season)
+    # Alternating so neither match is always the last rows, replaced rows are zeroed and then compacted
+    for version in range(2, 8):
+        season.add(1, version, match('Mumbai', 'Delhi', 120 + version))
+        season.add(2, version, match('Chennai', 'Kolkata', 150 + version))
+    season.add(3, 1, match('Delhi', 'Chennai', 180))
+
+    fresh = Season()
+    fresh.add(1, 7, match('Mumbai', 'Delhi', 127))
+    fresh.add(2, 7, match('Chennai', 'Kolkata', 157))
+    fresh.add(3, 1, match('Delhi', 'Chennai', 180))
+    assert season.match_count == fresh.match_count == 3
+    assert boards(season) == boards(fresh)
+    assert boards(season, {1, 3}) == boards(fresh, {1, 3})
+
+def test_bowlers_wait_for_the_other_side(backend):
+    season = Season()
+    season.add(1, 1, match('Mumbai', 'Delhi', 120, second_innings=False))
+    assert season.leaderboard('wickets') == []
+    assert [row['player'] for row in season.leaderboard('runs')] == ['A Mumbai', 'B Mumbai']
+
+def test_no_rows_below_a_limit_of_one(backend):
+    season = Season()
+    season.add(1, 1, match('Mumbai', 'Delhi', 120))
+    assert all(season.leaderboard(board, 0) == [] for board in BOARDS)
+    assert [row['team'] for row in season.leaderboard('team_wickets', 1)] == ['Delhi']
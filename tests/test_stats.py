@@ -0,0 +1,46 @@
+from models import BattingRow, Innings, Match
+from stats import StatsTracker, innings_limit, partnerships
+
+def batting(*names):
+    return [BattingRow.from_text(name, 'not out', '0', '0', '0', '0', '0.00') for name in names]
+
+def innings(number, team, score, fall_of_wickets='', names=('A', 'B', 'C', 'D', 'E')):
+    return Innings.from_text(number, f"{team} Innings", score, batting(*names), [], fall_of_wickets)
+
+def test_partnerships_follow_the_fall_of_wickets():
+    stands = partnerships(innings(1, 'Mumbai', '150-3 (20.0 Ov)', '1-20 (A, 3.0), 2-60 (B, 9.0), 3-100 (C, 15.0)'))
+    assert [(stand.wicket, stand.runs, stand.balls, stand.batsmen, stand.unbroken) for stand in stands] == [
+        (1, 20, 18, ('A', 'B'), False),
+        (2, 40, 36, ('B', 'C'), False),
+        (3, 40, 36, ('C', 'D'), False),
+        (4, 50, 30, ('D', 'E'), True),
+    ]
+
+def test_partnerships_past_the_innings_overs_have_no_length():
+    # A fall of wickets past the innings overs is a broken page, not a negative stand
+    stands = partnerships(innings(1, 'Mumbai', '248-7 (19.0 Ov)', '1-28 (A, 7.3), 2-60 (B, 55.1)'))
+    assert [stand.balls for stand in stands] == [45, None, None]
+
+def test_innings_limit_is_unknown_for_first_class_matches():
+    first = innings(1, 'Hyderabad', '120-10 (40.0 Ov)')
+    second = innings(2, 'Gujarat', '50-2 (15.0 Ov)')
+    stumps = Match('stump', 'Day 1: Stumps - Gujarat trail by 70 runs', [first, second])
+    assert innings_limit(stumps, None) is None
+    assert innings_limit(stumps, None, 't20') is None
+    # Short innings alone don't make a match limited-overs
+    morning = Match('live', 'Day 1: 1st Session', [innings(1, 'Hyderabad', '60-1 (15.0 Ov)')])
+    assert innings_limit(morning, None) is None
+    assert innings_limit(Match('live', '', [first, second]), None) is None
+
+    stats = StatsTracker().update(Match('live', '', [first, second]))
+    assert (stats[1].projected, stats[2].projected, stats[2].target, stats[2].required_rate) == (None, None, None, None)
+
+def test_innings_limit_of_limited_overs_matches():
+    first = innings(1, 'Mumbai', '198-8 (20.0 Ov)')
+    second = innings(2, 'Delhi', '157-6 (15.0 Ov)')
+    chase = Match('live', 'Delhi need 42 runs in 30 balls', [first, second])
+    assert innings_limit(chase, (42, 30)) == 120
+    assert innings_limit(Match('live', '', [first, second]), None, 't20') == 120
+
+    stats = StatsTracker().update(chase)
+    assert (stats[2].target, stats[2].runs_needed, stats[2].balls_left, stats[2].required_rate) == (199, 42, 30, 8.4)